@@ -1,163 +1,146 @@
-import streamlit as st
 import pandas as pd
-import numpy as np
-from scipy.stats import zscore
-
-# ---------------------------------------------------------
-# Part 1: Preparation of Data
-# ---------------------------------------------------------
-
-st.title('Multi-factor Model Data Processor')
-
-# File uploader
-uploaded_file = st.file_uploader("Please upload your Excel or CSV file:", type=["xlsx", "csv"])
-
-if uploaded_file is not None:
-    # Reading input data based on file type
-    file_extension = uploaded_file.name.split('.')[-1]
-    
-    if file_extension == 'csv':
-        in_data = pd.read_csv(uploaded_file, header=3, delimiter='\t')
-    elif file_extension == 'xlsx':
-        in_data = pd.read_excel(uploaded_file, header=3)
-    else:
-        st.error("Unsupported file format. Please upload an Excel or CSV file.")
-        st.stop()
-    
-    st.write("File uploaded successfully.")
-
-    # Filter stocks where 'In Buy List' > 0
-    if 'In Buy List' in in_data.columns:
-        data = in_data[in_data['In Buy List'] > 0]
-    else:
-        st.error("'In Buy List' column not found in uploaded file.")
-        st.stop()
-
-    # Print columns to verify correct loading
-    st.write("Columns available in the DataFrame:")
-    st.write(data.columns.tolist())
-
-    # Define function to pull Z-score data for specified factors
-    def extract_factor_scores(df):
-        # List of factors with columns to pull scores from
-        factors = [
-            {'output_col': 'Value', 'columns': ['Value Score (IQR)', 'Value Score (W)']},
-            {'output_col': 'Momentum', 'columns': ['Momentum Score (IQR)', 'Momentum Score (W)']},
-            {'output_col': 'PEG', 'columns': ['PEG Score (IQR)', 'PEG Score (W)']},
-            {'output_col': 'Earnings Surprise', 'columns': ['Earnings Surprise Score (IQR)', 'Earnings Surprise Score (W)']},
-            {'output_col': 'ROE', 'columns': ['Ret on Avg Total Equity (IQR)', 'Ret on Avg Total Equity (W)']},
-            {'output_col': 'ROA', 'columns': ['Ret on Avg Total Assets (IQR)', 'Ret on Avg Total Assets (W)']},
-            {'output_col': 'Net Profit Margin', 'columns': ['Net Income Margin (IQR)', 'Net Income Margin (W)']},
-            {'output_col': '5Y Growth Gross Profit', 'columns': ['Chg in GP/Sales Score (IQR)', 'Chg in GP/Sales Score (W)']},
-            {'output_col': '5Y NI-BV Growth', 'columns': ['Chg in NI/BV Score (IQR)', 'Chg in NI/BV Score (W)']},
-            {'output_col': '5Y NI-Asset Growth', 'columns': ['Chg in NI/Assets Score (IQR)', 'Chg in NI/Assets Score (W)']},
-            {'output_col': 'Dividend Payout Ratio', 'columns': ['Div Pd Score (IQR)', 'Div Pd Score (W)']},
-            {'output_col': 'Pct Change Shares Outstanding', 'columns': ['Chg Shs Outstdg Score (IQR)', 'Chg Shs Outstdg Score (W)']},
-            {'output_col': 'Debt-to-Equity', 'columns': ['D/E Score (IQR)', 'D/E Score (W)']},
-            {'output_col': 'Pre-tax Interest Coverage', 'columns': ['PreTax Int Cov Score (IQR)', 'PreTax Int Cov Score (W)']},
-            {'output_col': 'Accruals', 'columns': ['Norm Accrual Score (IQR)', 'Norm Accrual Score (W)']},
-            {'output_col': 'Beta', 'columns': ['Norm Beta (IQR)', 'Norm Beta (W)']},
-            {'output_col': 'Final Model Score', 'columns': ['Final Model Score (IQR)', 'Final Model Score (W)']}
-        ]
-        
-        # Loop through factors and assign scores based on availability
-        for factor in factors:
-            output_col = factor['output_col']
-            col_IQR, col_W = factor['columns']
-            # Use IQR score if available, otherwise use W score
-            df[output_col] = df.get(col_IQR, np.nan).combine_first(df.get(col_W, np.nan))
-        
-        return df
-
-    # Process data to extract the Z-score model data
-    data = extract_factor_scores(data)
+import streamlit as st
 
+import instrumentation
+from export import EXPORT_FORMATS
+from factor_correlation import composite_weights, factor_covariance
+from pipeline import FINAL_COLUMNS, export_file, final_frame, load_export, ranking_index, scored_view
+from result_cache import content_hash
+
+NEUTRALIZATION_OPTIONS = {
+    'Across the whole buy list': None,
+    'Within FactSet Econ Sector': 'FactSet Econ Sector',
+    'Within FactSet Ind': 'FactSet Ind',
+}
+
+# (source, method) passed to factor_engine.score_factors
+SCORING_OPTIONS = {
+    'Upstream IQR/W scores, z-score': ('scores', 'zscore'),
+    'Raw values, z-score': ('raw', 'zscore'),
+    'Raw values, robust (median/IQR)': ('raw', 'robust'),
+    'Raw values, winsorized z-score': ('raw', 'winsorized'),
+}
+
+# nan_policy passed to factor_engine.score_factors. Raw inputs (e.g. 'B/P') have gaps in most
+# factors, so 'propagate' would blank whole factors; the raw modes default to 'omit'
+NAN_POLICY_OPTIONS = {
+    'Blank a factor that has any missing value': 'propagate',
+    'Score each factor over the names that have it': 'omit',
+}
+
+
+def main():
     # ---------------------------------------------------------
-    # Part 2: Calculating Z-scores for Each Factor
+    # Part 1: Preparation of Data
     # ---------------------------------------------------------
 
-    def calculate_z_scores(df):
-        factors = [
-            {'output_col': 'Value', 'columns': ['Value Score (IQR)', 'Value Score (W)']},
-            {'output_col': 'Momentum', 'columns': ['Momentum Score (IQR)', 'Momentum Score (W)']},
-            {'output_col': 'PEG', 'columns': ['PEG Score (IQR)', 'PEG Score (W)']},
-            {'output_col': 'Earnings Surprise', 'columns': ['Earnings Surprise Score (IQR)', 'Earnings Surprise Score (W)']},
-            {'output_col': 'ROE', 'columns': ['Ret on Avg Total Equity (IQR)', 'Ret on Avg Total Equity (W)']},
-            {'output_col': 'ROA', 'columns': ['Ret on Avg Total Assets (IQR)', 'Ret on Avg Total Assets (W)']},
-            {'output_col': 'Net Profit Margin', 'columns': ['Net Income Margin (IQR)', 'Net Income Margin (W)']},
-            {'output_col': '5Y Growth Gross Profit', 'columns': ['Chg in GP/Sales Score (IQR)', 'Chg in GP/Sales Score (W)']},
-            {'output_col': '5Y NI-BV Growth', 'columns': ['Chg in NI/BV Score (IQR)', 'Chg in NI/BV Score (W)']},
-            {'output_col': '5Y NI-Asset Growth', 'columns': ['Chg in NI/Assets Score (IQR)', 'Chg in NI/Assets Score (W)']},
-            {'output_col': 'Dividend Payout Ratio', 'columns': ['Div Pd Score (IQR)', 'Div Pd Score (W)']},
-            {'output_col': 'Pct Change Shares Outstanding', 'columns': ['Chg Shs Outstdg Score (IQR)', 'Chg Shs Outstdg Score (W)']},
-            {'output_col': 'Debt-to-Equity', 'columns': ['D/E Score (IQR)', 'D/E Score (W)']},
-            {'output_col': 'Pre-tax Interest Coverage', 'columns': ['PreTax Int Cov Score (IQR)', 'PreTax Int Cov Score (W)']},
-            {'output_col': 'Accruals', 'columns': ['Norm Accrual Score (IQR)', 'Norm Accrual Score (W)']},
-            {'output_col': 'Beta', 'columns': ['Norm Beta (IQR)', 'Norm Beta (W)']},
-            {'output_col': 'Final Model Score', 'columns': ['Final Model Score (IQR)', 'Final Model Score (W)']}
-        ]
-
-        z_columns = []
-
-        for factor in factors:
-            output_col = factor['output_col']
-            col_IQR, col_W = factor['columns']
-            # Use IQR score if available, otherwise use W score
-            df[output_col] = df.get(col_IQR, np.nan).combine_first(df.get(col_W, np.nan))
-
-            # Calculate Z-scores
-            if df[output_col].notna().any():  # Check if any values are present
-                z_col = f'z_{output_col.lower().replace(" ", "_")}'  # Create a Z-score column name
-                # Invert sign for specified valuation variables
-                if output_col in ['Value', 'PEG', 'Dividend Payout Ratio']:
-                    df[z_col] = zscore(-df[output_col])
-                else:
-                    df[z_col] = zscore(df[output_col])
-                z_columns.append(z_col)
-
-        # Aggregate Z-score as the mean of individual Z-scores
-        df['zaggr'] = df[z_columns].mean(axis=1)
-        
-        return df
-
-    # Calculate Z-scores and display the results
-    data = calculate_z_scores(data)
-
-    # Define and calculate group scores
-    groups = {
-        'Profitability Group': ['z_roe', 'z_roa', 'z_net_profit_margin'],
-        'Growth Group': ['z_5y_growth_gross_profit', 'z_5y_ni_bv_growth', 'z_5y_ni_asset_growth'],
-        'Payout Group': ['z_dividend_payout_ratio', 'z_pct_change_shares_outstanding'],
-        'Safety Group': ['z_debt_to_equity', 'z_pre_tax_interest_coverage']
-    }
-
-    for group_name, group_factors in groups.items():
-        data[group_name] = data[group_factors].mean(axis=1)
-
-    data['Total Composite Z-score'] = data[list(groups.keys())].mean(axis=1)
-    data['Difference'] = data['Final Model Score'] - data['Total Composite Z-score']
-
-    # Create the final DataFrame
-    final_columns = ['Company Name', 'Exchange Name (VND)', 'CUSIP', 'FactSet Econ Sector',
-                     'FactSet Ind', 'Gen Sec Type Desc', 'Final Model Score',
-                     'Profitability Group', 'Growth Group', 'Payout Group', 'Safety Group',
-                     'Total Composite Z-score', 'Difference']
-    
-    # Check if all columns exist in data
-    final_data = data[[col for col in final_columns if col in data.columns]]
-
-    # Display final data
-    st.write("Final Data:")
-    st.dataframe(final_data)
-
-    # Optional: Save processed data as downloadable file
-    def convert_df(df):
-        return df.to_csv(index=False).encode('utf-8')
-
-    csv = convert_df(data)
-    st.download_button(
-        label="Download Processed Data as CSV",
-        data=csv,
-        file_name='processed_data.csv',
-        mime='text/csv'
-    )
+    st.title('Multi-factor Model Data Processor')
+    run = instrumentation.begin_run()  # None unless UES_INSTRUMENT is set
+
+    # File uploader
+    uploaded_file = st.file_uploader("Please upload your Excel or CSV file (or an Arrow/Parquet file from convert_export.py):",
+                                     type=["xlsx", "csv", "arrow", "feather", "parquet"])
+
+    if uploaded_file is not None:
+        # Reading input data based on file type; only buy-list rows and model columns are loaded
+        # Every stage below is memoized on the upload's content hash, so reruns triggered
+        # by widget interaction (or re-uploading the same file) are served from cache
+        file_extension = uploaded_file.name.split('.')[-1]
+        with instrumentation.span('zsm.upload'):
+            content = uploaded_file.getvalue()
+            digest = content_hash(content)
+        instrumentation.count('zsm.upload_bytes', len(content))
+
+        try:
+            data = load_export(content, file_extension, digest)
+        except ValueError as e:
+            st.error(str(e))
+            st.stop()
+
+        st.write("File uploaded successfully.")
+
+        # Print columns to verify correct loading
+        st.write("Columns available in the DataFrame:")
+        st.write(data.columns.tolist())
+
+        # ---------------------------------------------------------
+        # Part 2: Calculating Z-scores, Group and Composite Scores
+        # ---------------------------------------------------------
+
+        # Standardize across the whole buy list, or within each sector/industry
+        neutralization = st.selectbox("Z-score factors:", list(NEUTRALIZATION_OPTIONS))
+        group_by = NEUTRALIZATION_OPTIONS[neutralization]
+        scoring = st.selectbox("Scoring method:", list(SCORING_OPTIONS))
+        source, method = SCORING_OPTIONS[scoring]
+        policies = list(NAN_POLICY_OPTIONS.values())
+        missing = st.selectbox("Missing values:", list(NAN_POLICY_OPTIONS),
+                               index=policies.index('omit' if source == 'raw' else 'propagate'))
+        options = dict(group_by=group_by, source=source, method=method, nan_policy=NAN_POLICY_OPTIONS[missing])
+
+        # Coalesce IQR/W scores and z-score every factor in one pass (see factor_engine.FACTOR_SPEC).
+        # The scored frame is one read-only copy shared by all sessions; the session keeps
+        # its reference until it switches dataset or ends
+        try:
+            view = scored_view(content, file_extension, digest, **options)
+        except ValueError as e:
+            st.error(str(e))
+            st.stop()
+        previous = st.session_state.get('scored_view')
+        st.session_state['scored_view'] = view
+        if previous is not None:
+            previous.release()
+        data = view.frame
+
+        # Top/bottom names from the ranking index built once per scoring run, so only
+        # the requested rows are sent to the browser
+        index = ranking_index(content, file_extension, digest, **options)
+        st.subheader("Rankings")
+        rank_column = st.selectbox("Rank by:", index.score_columns)
+        sector = st.selectbox("Sector:", ['All sectors'] + index.sectors())
+        direction = st.radio("Show:", ['Top', 'Bottom'], horizontal=True)
+        top_n = st.slider("Number of names:", min_value=5, max_value=200, value=50, step=5)
+        with instrumentation.span('zsm.render_rankings'):
+            st.dataframe(index.top(rank_column, n=top_n, sector=None if sector == 'All sectors' else sector,
+                                   ascending=direction == 'Bottom', columns=FINAL_COLUMNS))
+
+        # Create the final DataFrame
+        # Check if all columns exist in data
+        final_data = final_frame(data)
+
+        # Display final data
+        if st.checkbox("Show the full scored universe"):
+            st.write("Final Data:")
+            with instrumentation.span('zsm.render_table'):
+                st.dataframe(final_data)
+
+        # Redundancy among the factors that the group averages treat as independent
+        if st.checkbox("Show factor correlations"):
+            with instrumentation.span('zsm.factor_correlation'):
+                correlation = factor_covariance(data, shrinkage='ledoit-wolf')
+            st.write(f"Factor correlation (Ledoit-Wolf shrinkage {correlation['shrinkage']:.2f}):")
+            st.dataframe(correlation['corr'].round(2))
+            st.write("Composite weights:")
+            st.dataframe(pd.concat([composite_weights(correlation['cov'], method)
+                                    for method in ('equal', 'inverse_variance', 'orthogonal')], axis=1).round(3))
+
+        # Optional: Save processed data as downloadable file (final columns plus z-columns).
+        # The file is only generated once "Prepare download" is clicked, not on every rerun
+        export_format = st.selectbox("Download format:", list(EXPORT_FORMATS))
+        extension, mime = EXPORT_FORMATS[export_format]
+        export_key = (digest, export_format, tuple(sorted(options.items())))
+        if st.button("Prepare download"):
+            st.session_state['prepared_export'] = export_key
+        if st.session_state.get('prepared_export') == export_key:
+            st.download_button(
+                label=f"Download Processed Data ({export_format})",
+                data=export_file(content, file_extension, digest, fmt=export_format, **options),
+                file_name=f'processed_data.{extension}',
+                mime=mime
+            )
+
+    instrumentation.render_sidebar(run)
+
+
+# The UI only runs under `streamlit run ZSM.py`; importing this module has no side effects
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import itertools
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from ingest import FORWARD_RETURN_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+SCORE_COLUMNS = ['Total Composite Z-score', 'Profitability Group', 'Growth Group', 'Payout Group',
+                 'Safety Group']
+
+
+# ---------------------------------------------------------
+# Panel construction
+# ---------------------------------------------------------
+
+def build_panel(snapshots, columns, key_column='CUSIP'):
+    """Stack monthly scored snapshots into dates x assets arrays.
+
+    `snapshots` maps each date to a scored DataFrame. Returns (dates, assets,
+    {column: 2-D float array}); assets missing on a date are NaN.
+    """
+    frames = [df[[key_column] + [col for col in columns if col in df.columns]].assign(_date=date)
+              for date, df in snapshots.items()]
+    long = pd.concat(frames, ignore_index=True)
+    # factorize codes a missing key as -1, which would write into the last asset's column
+    missing = long[key_column].isna()
+    if missing.any():
+        logger.warning(f"Dropping {int(missing.sum())} rows with no {key_column}")
+        long = long[~missing]
+    date_codes, dates = pd.factorize(long['_date'], sort=True)
+    asset_codes, assets = pd.factorize(long[key_column], sort=True)
+
+    panel = {}
+    for col in columns:
+        values = np.full((len(dates), len(assets)), np.nan)
+        if col in long.columns:
+            values[date_codes, asset_codes] = pd.to_numeric(long[col], errors='coerce').to_numpy(dtype=float)
+        panel[col] = values
+    return pd.Index(dates, name='Date'), pd.Index(assets, name=key_column), panel
+
+
+def _ranks(values, ties='ordinal'):
+    # Rank along each row (0 = lowest), NaN where the input is NaN. ties='ordinal' breaks
+    # ties by position (equal-count buckets); 'average' gives tied values their mean rank,
+    # as scipy.stats.rankdata does, which is what the Spearman IC needs
+    order = np.argsort(values, axis=1, kind='stable')
+    positions = np.broadcast_to(np.arange(values.shape[1], dtype=float), values.shape)
+    if ties == 'average':
+        ordered = np.take_along_axis(values, order, axis=1)
+        # Each run of equal values spans [start, end]; NaNs sort last and never compare equal
+        new_run = np.ones(values.shape, dtype=bool)
+        new_run[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+        last_in_run = np.ones(values.shape, dtype=bool)
+        last_in_run[:, :-1] = new_run[:, 1:]
+        start = np.maximum.accumulate(np.where(new_run, positions, 0), axis=1)
+        end = np.minimum.accumulate(np.where(last_in_run, positions, values.shape[1])[:, ::-1], axis=1)[:, ::-1]
+        positions = (start + end) / 2
+    ranks = np.empty(values.shape)
+    np.put_along_axis(ranks, order, positions, axis=1)
+    ranks[np.isnan(values)] = np.nan
+    return ranks
+
+
+# ---------------------------------------------------------
+# Backtest
+# ---------------------------------------------------------
+
+def run_backtest(dates, scores, returns, n_quantiles=5):
+    """Quantile portfolio returns, turnover and Spearman IC for every date at once.
+
+    `scores` and `returns` are dates x assets arrays; each date's names with both
+    a score and a forward return are split into `n_quantiles` equal-count buckets
+    (Q1 lowest score). Returns a dict with 'quantile_returns', 'spread'
+    (top minus bottom), 'turnover', 'ic' and a 'summary' of the series.
+    """
+    valid = ~np.isnan(scores) & ~np.isnan(returns)
+    scores = np.where(valid, scores, np.nan)
+    returns = np.where(valid, returns, np.nan)
+    n_valid = valid.sum(axis=1)
+
+    score_ranks = _ranks(scores)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        buckets = np.floor(score_ranks * n_quantiles / n_valid[:, None])
+
+    labels = [f"Q{q + 1}" for q in range(n_quantiles)]
+    quantile_returns = np.full((len(dates), n_quantiles), np.nan)
+    turnover = np.full((len(dates), n_quantiles), np.nan)
+    filled_returns = np.where(valid, returns, 0.0)
+    for q in range(n_quantiles):
+        members = buckets == q
+        counts = members.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            quantile_returns[:, q] = (filled_returns * members).sum(axis=1) / counts
+            # Share of this month's names that were not in the same bucket last month
+            stayed = (members[1:] & members[:-1]).sum(axis=1)
+            turnover[1:, q] = 1 - stayed / counts[1:]
+
+    # Spearman IC = Pearson correlation of the score and return ranks per date, ties averaged
+    return_ranks = _ranks(returns, ties='average')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Both rank sets average to (n - 1) / 2 over the same names, ties or not
+        sr = _ranks(scores, ties='average') - ((n_valid - 1) / 2)[:, None]
+        rr = return_ranks - ((n_valid - 1) / 2)[:, None]
+        ic = np.nansum(sr * rr, axis=1) / np.sqrt(np.nansum(sr ** 2, axis=1) * np.nansum(rr ** 2, axis=1))
+    ic[n_valid < 3] = np.nan
+
+    quantile_returns = pd.DataFrame(quantile_returns, index=dates, columns=labels)
+    spread = (quantile_returns[labels[-1]] - quantile_returns[labels[0]]).rename('spread')
+    ic = pd.Series(ic, index=dates, name='ic')
+    return {
+        'quantile_returns': quantile_returns,
+        'spread': spread,
+        'turnover': pd.DataFrame(turnover, index=dates, columns=labels),
+        'ic': ic,
+        'summary': {
+            'periods': int((n_valid > 0).sum()),
+            'mean_ic': ic.mean(),
+            'ic_ir': ic.mean() / ic.std(),
+            'ic_t_stat': ic.mean() / ic.std() * np.sqrt(ic.count()),
+            'mean_spread': spread.mean(),
+            'mean_turnover': np.nanmean(turnover[1:]) if np.isfinite(turnover[1:]).any() else np.nan,
+        },
+    }
+
+
+def _sweep_one(dates, scores, returns, score_column, return_column, n_quantiles):
+    result = run_backtest(dates, scores, returns, n_quantiles)
+    return {'score': score_column, 'return': return_column, 'quantiles': n_quantiles, **result['summary']}
+
+
+def sweep(dates, panel, score_columns=SCORE_COLUMNS, return_columns=FORWARD_RETURN_COLUMNS,
+          quantiles=(5, 10), processes=None):
+    """Summary statistics for every (score, return, quantiles) combination.
+
+    With `processes` > 1 the combinations are spread over a process pool.
+    """
+    present = [col for col in set(score_columns) | set(return_columns)
+               if col in panel and not np.isnan(panel[col]).all()]
+    # Each task only carries the two arrays it needs
+    tasks = [(dates, panel[score], panel[ret], score, ret, n_quantiles)
+             for score, ret, n_quantiles in itertools.product(score_columns, return_columns, quantiles)
+             if score in present and ret in present]
+    if processes and processes > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            rows = list(pool.map(_sweep_one, *zip(*tasks)))
+    else:
+        rows = [_sweep_one(*task) for task in tasks]
+    return pd.DataFrame(rows, columns=['score', 'return', 'quantiles', 'periods', 'mean_ic', 'ic_ir',
+                                       'ic_t_stat', 'mean_spread', 'mean_turnover'])
+
+
+# ---------------------------------------------------------
+# Loading scored snapshots
+# ---------------------------------------------------------
+
+DATE_PATTERN = re.compile(r'(\d{4})[-_]?(\d{2})(?:[-_]?(\d{2}))?')
+
+
+def snapshot_date(path):
+    # Snapshot date from the file name, e.g. export_2023-06_processed.csv or 20230630.csv
+    match = DATE_PATTERN.search(os.path.basename(path))
+    if not match:
+        raise ValueError(f"No YYYYMM or YYYY-MM date in file name: {path}")
+    year, month, day = match.groups()
+    return pd.Timestamp(int(year), int(month), int(day or 1))
+
+
+def load_snapshots(paths, columns, key_column='CUSIP'):
+    # Scored CSVs as written by zsm_batch.py, keyed by their file-name date
+    return {snapshot_date(path): pd.read_csv(path, usecols=lambda col: col in set(columns) | {key_column},
+                                             dtype={key_column: str})
+            for path in paths}
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Backtest ZSM scores against forward returns.')
+    parser.add_argument('input_dir', help='directory of scored monthly CSVs (zsm_batch.py output)')
+    parser.add_argument('--quantiles', type=int, nargs='+', default=[5, 10])
+    parser.add_argument('-j', '--processes', type=int, default=1)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    paths = sorted(os.path.join(args.input_dir, name) for name in os.listdir(args.input_dir)
+                   if name.endswith('.csv'))
+    columns = SCORE_COLUMNS + FORWARD_RETURN_COLUMNS
+    dates, assets, panel = build_panel(load_snapshots(paths, columns), columns)
+    loaded = time.perf_counter()
+
+    summary = sweep(dates, panel, quantiles=args.quantiles, processes=args.processes)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(summary.to_string(index=False))
+    print(f"{len(dates)} dates x {len(assets)} names: load {loaded - started:.2f}s, "
+          f"backtest {time.perf_counter() - loaded:.2f}s")
@@ -0,0 +1,164 @@
+"""Benchmarks for the scoring and metrics paths.
+
+Run from the repository root:
+
+    python -m benchmarks.run                   # run and compare against baseline.json
+    python -m benchmarks.run --save-baseline   # record a new baseline
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import factset_frame, price_histories, write_export
+from export import export_bytes, export_columns
+from factor_engine import coalesce_factors, score_factors, zscore_matrix
+from fetch_engine import fetch_histories
+from ingest import read_export
+from metrics import build_panel, compute_panel_metrics, get_all_metrics
+from pipeline import FINAL_COLUMNS
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def measure(fn, repeat=3):
+    """Best wall time over `repeat` runs, plus peak traced memory of one run."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def bench_scoring(sizes, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in sizes:
+            df = factset_frame(n_rows)
+            path = os.path.join(tmp, f"export_{n_rows}.csv")
+            write_export(df, path)
+            data = read_export(path, 'csv')
+            values = coalesce_factors(data)
+            scored = score_factors(data)
+            projected = scored[export_columns(scored, FINAL_COLUMNS)]
+
+            stages = {
+                'ingest': lambda: read_export(path, 'csv'),
+                'coalesce': lambda: coalesce_factors(data),
+                'zscore': lambda: zscore_matrix(values),
+                'score_factors': lambda: score_factors(data),
+                'score_factors_sector': lambda: score_factors(data, group_by='FactSet Econ Sector'),
+                'score_factors_raw_winsorized': lambda: score_factors(data, source='raw', method='winsorized'),
+                'sector_groupby_mean': lambda: scored.groupby('FactSet Econ Sector', observed=True)[
+                    ['Profitability Group', 'Growth Group', 'Payout Group', 'Safety Group',
+                     'Total Composite Z-score']].mean(),
+                # The download path: final columns plus z-columns, written in chunks
+                'export_csv.gz': lambda: export_bytes(projected, 'csv.gz'),
+                'export_parquet': lambda: export_bytes(projected, 'parquet'),
+            }
+            for stage, fn in stages.items():
+                seconds, peak = measure(fn, repeat)
+                rows = n_rows if stage == 'ingest' else len(data)
+                results[f"{stage}[{n_rows}]"] = {'seconds': seconds, 'rows_per_s': rows / seconds,
+                                                 'peak_mb': peak / 1e6}
+    return results
+
+
+def bench_metrics(ticker_counts, repeat):
+    results = {}
+    for n_tickers in ticker_counts:
+        tickers, provider = price_histories(n_tickers)
+        histories = fetch_histories(tickers, provider=provider, rate=1e6, max_workers=4)
+        close, volume = build_panel(histories)
+
+        stages = {
+            'build_panel': lambda: build_panel(histories),
+            'compute_panel_metrics': lambda: compute_panel_metrics(close, volume, sp500_return=0.0),
+            # End to end against the stub provider with the rate limiter effectively off
+            'get_all_metrics': lambda: get_all_metrics(tickers, provider=provider, rate=1e6, max_workers=4),
+        }
+        for stage, fn in stages.items():
+            seconds, peak = measure(fn, repeat)
+            results[f"{stage}[{n_tickers}]"] = {'seconds': seconds, 'rows_per_s': n_tickers / seconds,
+                                                'peak_mb': peak / 1e6}
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"{'benchmark':<36} {'seconds':>9} {'rows/s':>12} {'peak MB':>9} {'vs base':>8}")
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        ratio = result['seconds'] / base['seconds'] if base else None
+        flag = ''
+        if ratio is not None and ratio > 1 + tolerance:
+            flag = ' REGRESSION'
+            regressions.append(name)
+        print(f"{name:<36} {result['seconds']:>9.4f} {result['rows_per_s']:>12,.0f} "
+              f"{result['peak_mb']:>9.1f} {f'{ratio:.2f}x' if ratio else '-':>8}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the ZSM scoring and metrics paths.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--tickers', type=int, nargs='+', default=[100, 1_500])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown vs baseline')
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--output', help='also write results as JSON to this path')
+    args = parser.parse_args(argv)
+
+    # Keep the metrics progress output out of the report
+    quiet = open(os.devnull, 'w')
+    stdout, sys.stdout = sys.stdout, quiet
+    try:
+        results = {**bench_scoring(args.sizes, args.repeat), **bench_metrics(args.tickers, args.repeat)}
+    finally:
+        sys.stdout = stdout
+        quiet.close()
+
+    report = {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {BASELINE_PATH}")
+    elif regressions:
+        print(f"{len(regressions)} benchmarks slower than baseline by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
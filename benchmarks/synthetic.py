@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from factor_engine import SOURCE_COLUMNS
+from fetch_engine import StubDataProvider
+from ingest import BUY_LIST_COLUMN, ID_COLUMNS
+from screener import PARAMETERS
+
+SECTORS = ['Technology', 'Health Technology', 'Finance', 'Energy Minerals', 'Utilities',
+           'Retail Trade', 'Producer Manufacturing', 'Consumer Services', 'Communications',
+           'Transportation', 'Non-Energy Minerals']
+
+
+def factset_frame(n_rows, seed=0, buy_list_fraction=0.6, missing_fraction=0.02):
+    """DataFrame shaped like a FactSet export: every PARAMETERS column plus the
+    identifier and ZSM factor source columns, with `missing_fraction` NaNs in the W scores."""
+    rng = np.random.default_rng(seed)
+    numeric_columns = [col for col in dict.fromkeys(PARAMETERS + SOURCE_COLUMNS)
+                       if col not in ID_COLUMNS]
+    data = {col: rng.normal(size=n_rows) for col in numeric_columns}
+    data[BUY_LIST_COLUMN] = (rng.random(n_rows) < buy_list_fraction).astype(float)
+    for col in SOURCE_COLUMNS:
+        if col.endswith('(W)'):
+            data[col][rng.random(n_rows) < missing_fraction] = np.nan
+
+    sectors = rng.choice(SECTORS, n_rows)
+    data.update({
+        'Company Name': [f"Company {i}" for i in range(n_rows)],
+        'Exchange Name (VND)': rng.choice(['NYSE', 'NASDAQ'], n_rows),
+        'CUSIP': [f"{i:09d}" for i in range(n_rows)],
+        'FactSet Econ Sector': sectors,
+        'FactSet Ind': [f"{sector} {k}" for sector, k in zip(sectors, rng.integers(0, 6, n_rows))],
+        'Gen Sec Type Desc': 'Common Stock',
+    })
+    return pd.DataFrame(data)
+
+
+def write_export(df, path):
+    # Tab-delimited CSV with the three banner rows FactSet puts above the header
+    with open(path, 'w') as f:
+        f.write('FactSet Screening\nUniverse: synthetic\nCurrency: USD\n')
+        df.to_csv(f, sep='\t', index=False)
+
+
+def price_histories(n_tickers, n_days=252, seed=0):
+    tickers = [f"T{i:05d}" for i in range(n_tickers)]
+    return tickers, StubDataProvider(n_days=n_days, seed=seed)
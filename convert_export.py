@@ -0,0 +1,111 @@
+import hashlib
+import os
+
+import pandas as pd
+
+from ingest import HEADER_ROW, ID_COLUMNS, MODEL_COLUMNS
+
+FORMAT_VERSION = '1'
+BINARY_EXTENSIONS = {'arrow': 'arrow', 'feather': 'arrow', 'parquet': 'parquet'}
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _arrow_safe(df):
+    # Arrow needs string column names and one type per column; Excel object
+    # columns are made numeric when every value parses, otherwise strings.
+    # Identifiers always stay strings so CUSIPs keep their leading zeros.
+    df.columns = [str(col) for col in df.columns]
+    for col in df.columns[df.dtypes == object]:
+        numeric = pd.to_numeric(df[col], errors='coerce')
+        if col not in ID_COLUMNS and numeric.notna().sum() == df[col].notna().sum():
+            df[col] = numeric
+        else:
+            df[col] = df[col].astype('string')
+    return df
+
+
+def export_metadata(path):
+    """Return the metadata stored by convert_workbook (source hash, name, format version)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if BINARY_EXTENSIONS.get(path.rsplit('.', 1)[-1]) == 'parquet':
+        schema = pq.read_schema(path)
+    else:
+        schema = pa.ipc.open_file(pa.memory_map(path)).schema
+    metadata = schema.metadata or {}
+    return {key.decode()[len('ues.'):]: value.decode()
+            for key, value in metadata.items() if key.startswith(b'ues.')}
+
+
+def convert_workbook(source, destination=None, fmt='arrow', model_columns_only=False):
+    """Convert a FactSet .xlsx/.csv export into an Arrow (Feather v2) or Parquet file.
+
+    The file carries the Arrow schema plus the SHA-256 of the source export, so a
+    destination that already matches the source is left untouched. Arrow output
+    is written uncompressed so it can be memory-mapped without copying.
+    Returns the destination path.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    if fmt not in ('arrow', 'parquet'):
+        raise ValueError(f"fmt must be 'arrow' or 'parquet', got {fmt!r}")
+    destination = destination or os.path.splitext(source)[0] + '.' + fmt
+    source_hash = file_sha256(source)
+    if os.path.exists(destination) and export_metadata(destination).get('source_sha256') == source_hash:
+        return destination
+
+    usecols = (lambda col: col in set(MODEL_COLUMNS)) if model_columns_only else None
+    if source.endswith('.csv'):
+        df = pd.read_csv(source, header=HEADER_ROW, delimiter='\t', usecols=usecols,
+                         dtype={col: str for col in ID_COLUMNS}, low_memory=False)
+    else:
+        df = pd.read_excel(source, header=HEADER_ROW, usecols=usecols, dtype={col: str for col in ID_COLUMNS})
+
+    table = pa.Table.from_pandas(_arrow_safe(df), preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b'ues.source_sha256': source_hash.encode(),
+        b'ues.source_name': os.path.basename(source).encode(),
+        b'ues.format_version': FORMAT_VERSION.encode(),
+    })
+
+    tmp_path = destination + '.tmp'
+    if fmt == 'arrow':
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+    else:
+        pq.write_table(table, tmp_path)
+    os.replace(tmp_path, destination)
+    return destination
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Convert FactSet exports to a fast binary format for ZSM.py.')
+    parser.add_argument('sources', nargs='+', help='.xlsx or tab-delimited .csv exports')
+    parser.add_argument('--format', choices=['arrow', 'parquet'], default='arrow')
+    parser.add_argument('--output-dir', help='defaults to the directory of each source')
+    parser.add_argument('--model-columns-only', action='store_true',
+                        help='keep only the columns the factor model reads')
+    args = parser.parse_args()
+
+    for source in args.sources:
+        destination = None
+        if args.output_dir:
+            name = os.path.splitext(os.path.basename(source))[0] + '.' + args.format
+            destination = os.path.join(args.output_dir, name)
+        started = time.perf_counter()
+        destination = convert_workbook(source, destination, fmt=args.format,
+                                       model_columns_only=args.model_columns_only)
+        print(f"{source} -> {destination} ({time.perf_counter() - started:.2f}s)")
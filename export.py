@@ -0,0 +1,88 @@
+import gzip
+import io
+
+from factor_engine import FACTOR_SPEC, z_column
+
+# format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'csv.gz': ('csv.gz', 'application/gzip'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('csv', 'text/csv'),
+}
+
+
+def export_columns(scored, final_columns, spec=FACTOR_SPEC):
+    # The final score columns followed by each factor's z-column, in model order
+    z_columns = [z_column(factor['output_col']) for factor in spec]
+    return [col for col in dict.fromkeys(final_columns + z_columns) if col in scored.columns]
+
+
+def _chunks(df, chunksize):
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+def _write_csv(df, fileobj, chunksize, compress):
+    stream = gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=6, mtime=0) if compress else fileobj
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    try:
+        if len(df) == 0:
+            df.to_csv(text, index=False)
+        for i, chunk in enumerate(_chunks(df, chunksize)):
+            chunk.to_csv(text, index=False, header=i == 0)
+        text.flush()
+    finally:
+        text.detach()
+        if compress:
+            stream.close()
+
+
+def _write_parquet(df, fileobj, chunksize):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Categorical columns are written as plain strings so every chunk shares one schema
+    df = df.astype({col: object for col in df.columns if df[col].dtype == 'category'})
+    schema = pa.Schema.from_pandas(df.iloc[:chunksize], preserve_index=False)
+    # Text columns that are empty in the first chunk would otherwise be typed as null
+    schema = pa.schema([pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field
+                        for field in schema], metadata=schema.metadata)
+    with pq.ParquetWriter(fileobj, schema, compression='zstd') as writer:
+        for chunk in _chunks(df, chunksize):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def _write_xlsx(df, fileobj, chunksize):
+    import xlsxwriter
+
+    # constant_memory streams each row to a temp file instead of holding the sheet in memory
+    workbook = xlsxwriter.Workbook(fileobj, {'constant_memory': True, 'in_memory': False})
+    sheet = workbook.add_worksheet('Processed Data')
+    sheet.write_row(0, 0, list(df.columns))
+    row = 1
+    for chunk in _chunks(df, chunksize):
+        # Blank cells for missing values (xlsx has no NaN)
+        values = chunk.astype(object).where(chunk.notna(), None).to_numpy()
+        for record in values:
+            sheet.write_row(row, 0, record)
+            row += 1
+    workbook.close()
+
+
+def write_export(df, fileobj, fmt='csv.gz', chunksize=10_000):
+    """Write `df` to the binary file object `fileobj` in `chunksize`-row pieces."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format {fmt!r}; choose one of {', '.join(EXPORT_FORMATS)}.")
+    if fmt in ('csv', 'csv.gz'):
+        _write_csv(df, fileobj, chunksize, compress=fmt == 'csv.gz')
+    elif fmt == 'parquet':
+        _write_parquet(df, fileobj, chunksize)
+    else:
+        _write_xlsx(df, fileobj, chunksize)
+
+
+def export_bytes(df, fmt='csv.gz', chunksize=10_000):
+    buffer = io.BytesIO()
+    write_export(df, buffer, fmt, chunksize)
+    return buffer.getvalue()
@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+
+from factor_engine import FACTOR_SPEC, z_column
+
+WEIGHT_METHODS = ('equal', 'inverse_variance', 'min_variance', 'orthogonal')
+
+
+def z_columns(df, spec=FACTOR_SPEC):
+    # The factor z-columns score_factors produced for `df`, in model order
+    return [z_column(factor['output_col']) for factor in spec if z_column(factor['output_col']) in df.columns]
+
+
+# ---------------------------------------------------------
+# Kernels
+# ---------------------------------------------------------
+
+def _masked_moments(values):
+    # Pairwise sums over the rows where both columns are present, as matrix products:
+    # counts[i, j], sums[i, j] (sum of column i where j is present), cross[i, j] and squares[i, j]
+    mask = ~np.isnan(values)
+    m = mask.astype(float)
+    x = np.where(mask, values, 0.0)
+    return m.T @ m, x.T @ m, x.T @ x, (x * x).T @ m
+
+
+def nan_covariance(values, min_periods=2, ddof=1):
+    """Pairwise-complete covariance and correlation of the columns of `values`.
+
+    Matches DataFrame.cov/.corr (each pair uses only rows where both are present)
+    but costs four matrix products instead of a loop over pairs. Returns
+    (cov, corr, counts); pairs with fewer than `min_periods` rows are NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    # Centre on the column means first to keep the single-pass sums well conditioned
+    counts = (~np.isnan(values)).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        values = values - np.where(counts > 0, np.nansum(values, axis=0) / counts, 0.0)
+
+    n, sums, cross, squares = _masked_moments(values)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centred = cross - sums * sums.T / n
+        cov = centred / (n - ddof)
+        corr = centred / np.sqrt((squares - sums ** 2 / n) * (squares.T - sums.T ** 2 / n))
+    corr = np.clip(corr, -1.0, 1.0)
+    np.fill_diagonal(corr, np.where(np.diag(n) >= min_periods, 1.0, np.nan))
+    too_few = n < max(min_periods, ddof + 1)
+    cov[too_few] = np.nan
+    corr[too_few] = np.nan
+    return cov, corr, n
+
+
+def ledoit_wolf_shrinkage(values, cov=None):
+    """Ledoit-Wolf intensity for shrinking `cov` towards a scaled identity, in [0, 1].
+
+    Uses the same pairwise-complete rows as nan_covariance, so it equals the
+    textbook estimate when no values are missing.
+    """
+    values = np.asarray(values, dtype=float)
+    counts = (~np.isnan(values)).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        values = values - np.where(counts > 0, np.nansum(values, axis=0) / counts, 0.0)
+    n, _, cross, _ = _masked_moments(values)
+    squared = np.where(np.isnan(values), 0.0, values ** 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sample = cross / n if cov is None else cov
+        # Variance of each sample covariance entry, estimated from the fourth moments
+        pi = np.nansum(((squared.T @ squared) / n - sample ** 2) / n)
+    target = np.nanmean(np.diag(sample)) * np.eye(len(sample))
+    gamma = np.nansum((sample - target) ** 2)
+    if not gamma > 0:
+        return 0.0
+    return float(np.clip(pi / gamma, 0.0, 1.0))
+
+
+def shrink(cov, intensity):
+    # Blend towards the scaled identity; also repairs pairwise matrices that are not PSD
+    target = np.nanmean(np.diag(cov)) * np.eye(len(cov))
+    return intensity * target + (1 - intensity) * cov
+
+
+def _correlation(cov):
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return cov / np.outer(std, std)
+
+
+# ---------------------------------------------------------
+# Factor-level API
+# ---------------------------------------------------------
+
+def factor_covariance(df, columns=None, by=None, shrinkage=None, min_periods=2):
+    """Covariance and correlation of the factor z-columns of a scored frame.
+
+    `columns` defaults to every z-column present. `shrinkage` is None, a fixed
+    intensity in [0, 1] or 'ledoit-wolf'. With `by` (e.g. 'FactSet Econ Sector')
+    returns {group: result} computed within each group; otherwise one result, a
+    dict with 'cov', 'corr', 'n_obs' DataFrames and the 'shrinkage' applied.
+    """
+    # Z-columns with no observations (e.g. a factor missing from this export) carry no information
+    columns = [col for col in (columns or z_columns(df)) if df[col].notna().any()]
+    if by is not None:
+        if by not in df.columns:
+            raise ValueError(f"'{by}' column not found for per-group correlation.")
+        values = df[columns].to_numpy(dtype=float)
+        codes, labels = pd.factorize(df[by], sort=True)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+        return {label: _covariance_result(values[order[bounds[i]:bounds[i + 1]]], columns, shrinkage, min_periods)
+                for i, label in enumerate(labels)}
+    return _covariance_result(df[columns].to_numpy(dtype=float), columns, shrinkage, min_periods)
+
+
+def _covariance_result(values, columns, shrinkage, min_periods):
+    cov, corr, n = nan_covariance(values, min_periods=min_periods)
+    intensity = 0.0
+    if shrinkage is not None:
+        intensity = ledoit_wolf_shrinkage(values) if shrinkage == 'ledoit-wolf' else float(shrinkage)
+        if not 0.0 <= intensity <= 1.0:
+            raise ValueError(f"shrinkage must be None, 'ledoit-wolf' or in [0, 1], got {shrinkage!r}")
+        cov = shrink(cov, intensity)
+        corr = _correlation(cov)
+    frame = lambda matrix: pd.DataFrame(matrix, index=columns, columns=columns)
+    return {'cov': frame(cov), 'corr': frame(corr), 'n_obs': frame(n.astype(int)), 'shrinkage': intensity}
+
+
+def composite_weights(cov, method='inverse_variance'):
+    """Factor weights (summing to 1) for a composite of the z-columns.
+
+    'equal' is the current flat average; 'inverse_variance' scales by 1/variance;
+    'min_variance' uses inv(cov) @ 1; 'orthogonal' averages the symmetrically
+    (Loewdin) orthogonalized factors, i.e. weights proportional to corr^(-1/2) @ 1,
+    which discounts factors that duplicate each other. Factors with an undefined
+    variance (or any undefined covariance with another usable factor) get zero
+    weight; if no factor is usable every weight is NaN.
+    """
+    if method not in WEIGHT_METHODS:
+        raise ValueError(f"method must be one of {', '.join(WEIGHT_METHODS)}, got {method!r}")
+    labels = cov.index if isinstance(cov, pd.DataFrame) else None
+    cov = np.asarray(cov, dtype=float)
+    variance = np.diag(cov)
+    usable = np.isfinite(variance) & (variance > 0)
+    # Only pairs among usable factors matter; drop the factor with the most undefined
+    # covariances until the sub-matrix is finite
+    while usable.any():
+        undefined = (~np.isfinite(cov[np.ix_(usable, usable)])).sum(axis=1)
+        if not undefined.any():
+            break
+        usable[np.flatnonzero(usable)[np.argmax(undefined)]] = False
+    sub = cov[np.ix_(usable, usable)]
+
+    if not usable.any():
+        raw = np.array([])
+    elif method == 'equal':
+        raw = np.ones(usable.sum())
+    elif method == 'inverse_variance':
+        raw = 1 / np.diag(sub)
+    elif method == 'min_variance':
+        raw = np.linalg.pinv(sub) @ np.ones(len(sub))
+    else:
+        corr = _correlation(sub)
+        eigenvalues, eigenvectors = np.linalg.eigh(corr)
+        eigenvalues = np.clip(eigenvalues, 1e-8 * eigenvalues.max(), None)
+        raw = (eigenvectors / np.sqrt(eigenvalues)) @ eigenvectors.T @ np.ones(len(sub))
+        # Back to the factors' own scale
+        raw = raw / np.sqrt(np.diag(sub))
+
+    weights = np.zeros(len(cov)) if usable.any() else np.full(len(cov), np.nan)
+    weights[usable] = raw / raw.sum()
+    return pd.Series(weights, index=labels, name=method) if labels is not None else weights
+
+
+def weighted_composite(df, weights):
+    # Weighted mean of the z-columns, renormalized over the factors each row has
+    columns = [col for col in weights.index if weights[col] != 0]
+    values = df[columns].to_numpy(dtype=float)
+    w = weights[columns].to_numpy()
+    present = ~np.isnan(values)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.Series(np.where(present, values, 0.0) @ w / (present @ w), index=df.index,
+                         name=f'{weights.name} composite')
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Correlation of the ZSM factor z-scores in a scored CSV.')
+    parser.add_argument('scored_csv', help='output of zsm_batch.py')
+    parser.add_argument('--by', help="e.g. 'FactSet Econ Sector'")
+    parser.add_argument('--shrinkage', default=None, help="'ledoit-wolf' or a fixed intensity in [0, 1]")
+    args = parser.parse_args()
+
+    scored = pd.read_csv(args.scored_csv)
+    shrinkage = args.shrinkage if args.shrinkage in (None, 'ledoit-wolf') else float(args.shrinkage)
+    started = time.perf_counter()
+    result = factor_covariance(scored, shrinkage=shrinkage)
+    elapsed = time.perf_counter() - started
+    with pd.option_context('display.width', 250, 'display.max_columns', None):
+        print(result['corr'].round(2))
+        print(pd.concat([composite_weights(result['cov'], method) for method in WEIGHT_METHODS], axis=1).round(3))
+        if args.by:
+            for group, group_result in factor_covariance(scored, by=args.by, shrinkage=shrinkage).items():
+                print(f"\n{group} (shrinkage {group_result['shrinkage']:.2f})")
+                print(group_result['corr'].round(2))
+    print(f"{len(scored)} rows x {len(result['cov'])} factors in {elapsed * 1000:.1f}ms "
+          f"(shrinkage {result['shrinkage']:.3f})")
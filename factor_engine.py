@@ -0,0 +1,241 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+
+# ---------------------------------------------------------
+# Factor specification
+# ---------------------------------------------------------
+
+# Each factor is scored from its IQR column when available, otherwise its W column.
+# `raw_col` is the unscaled input the upstream spreadsheet derives those scores from
+# (used when scoring from raw values); `invert` flips the sign before standardizing;
+# `group` assigns it to a group score.
+FACTOR_SPEC = [
+    {'output_col': 'Value', 'columns': ['Value Score (IQR)', 'Value Score (W)'], 'raw_col': 'B/P', 'invert': True, 'group': None},
+    {'output_col': 'Momentum', 'columns': ['Momentum Score (IQR)', 'Momentum Score (W)'], 'raw_col': 'Compound Tot Ret (LOCAL)', 'invert': False, 'group': None},
+    {'output_col': 'PEG', 'columns': ['PEG Score (IQR)', 'PEG Score (W)'], 'raw_col': '1/PEG Avail(Est,Hist)', 'invert': True, 'group': None},
+    {'output_col': 'Earnings Surprise', 'columns': ['Earnings Surprise Score (IQR)', 'Earnings Surprise Score (W)'], 'raw_col': 'FE Surp Amount Eps Quarterly_Roll', 'invert': False, 'group': None},
+    {'output_col': 'ROE', 'columns': ['Ret on Avg Total Equity (IQR)', 'Ret on Avg Total Equity (W)'], 'raw_col': 'Ret on Avg Total Equity', 'invert': False, 'group': 'Profitability Group'},
+    {'output_col': 'ROA', 'columns': ['Ret on Avg Total Assets (IQR)', 'Ret on Avg Total Assets (W)'], 'raw_col': 'Ret on Avg Total Assets', 'invert': False, 'group': 'Profitability Group'},
+    {'output_col': 'Net Profit Margin', 'columns': ['Net Income Margin (IQR)', 'Net Income Margin (W)'], 'raw_col': 'Net Income Margin', 'invert': False, 'group': 'Profitability Group'},
+    {'output_col': '5Y Growth Gross Profit', 'columns': ['Chg in GP/Sales Score (IQR)', 'Chg in GP/Sales Score (W)'], 'raw_col': '5 yr Chg GP/Sales', 'invert': False, 'group': 'Growth Group'},
+    {'output_col': '5Y NI-BV Growth', 'columns': ['Chg in NI/BV Score (IQR)', 'Chg in NI/BV Score (W)'], 'raw_col': '5yr chg Net Inc/BV', 'invert': False, 'group': 'Growth Group'},
+    {'output_col': '5Y NI-Asset Growth', 'columns': ['Chg in NI/Assets Score (IQR)', 'Chg in NI/Assets Score (W)'], 'raw_col': '5 yr Chg NI/Assets', 'invert': False, 'group': 'Growth Group'},
+    {'output_col': 'Dividend Payout Ratio', 'columns': ['Div Pd Score (IQR)', 'Div Pd Score (W)'], 'raw_col': 'Cash Divs Pd Cmn CF/NI', 'invert': True, 'group': 'Payout Group'},
+    {'output_col': 'Pct Change Shares Outstanding', 'columns': ['Chg Shs Outstdg Score (IQR)', 'Chg Shs Outstdg Score (W)'], 'raw_col': 'Pct Chg Shs Out', 'invert': False, 'group': 'Payout Group'},
+    {'output_col': 'Debt-to-Equity', 'columns': ['D/E Score (IQR)', 'D/E Score (W)'], 'raw_col': 'Total Debt% Total Equity', 'invert': False, 'group': 'Safety Group'},
+    {'output_col': 'Pre-tax Interest Coverage', 'columns': ['PreTax Int Cov Score (IQR)', 'PreTax Int Cov Score (W)'], 'raw_col': 'Pretax Int Cov', 'invert': False, 'group': 'Safety Group'},
+    {'output_col': 'Accruals', 'columns': ['Norm Accrual Score (IQR)', 'Norm Accrual Score (W)'], 'raw_col': 'Accrual/ Total Assets', 'invert': False, 'group': None},
+    {'output_col': 'Beta', 'columns': ['Norm Beta (IQR)', 'Norm Beta (W)'], 'raw_col': '5 yr Beta', 'invert': False, 'group': None},
+    {'output_col': 'Final Model Score', 'columns': ['Final Model Score (IQR)', 'Final Model Score (W)'], 'raw_col': None, 'invert': False, 'group': None},
+]
+
+
+def z_column(output_col):
+    # e.g. 'Debt-to-Equity' -> 'z_debt_to_equity'
+    return 'z_' + output_col.lower().replace(' ', '_').replace('-', '_')
+
+
+def factor_groups(spec=FACTOR_SPEC):
+    groups = {}
+    for factor in spec:
+        if factor['group'] is not None:
+            groups.setdefault(factor['group'], []).append(z_column(factor['output_col']))
+    return groups
+
+
+GROUPS = factor_groups()
+SOURCE_COLUMNS = [col for factor in FACTOR_SPEC for col in factor['columns']]
+RAW_COLUMNS = [factor['raw_col'] for factor in FACTOR_SPEC if factor['raw_col']]
+
+METHODS = ('zscore', 'robust', 'winsorized')
+# IQR of a normal distribution in standard deviations, so robust scores are on a z scale
+IQR_TO_STD = 1.349
+
+# ---------------------------------------------------------
+# Kernels
+# ---------------------------------------------------------
+
+def coalesce_factors(df, spec=FACTOR_SPEC):
+    # Returns an (n_rows x n_factors) array: the IQR score where present, else the W score
+    primary = df.reindex(columns=[factor['columns'][0] for factor in spec]).to_numpy(dtype=float)
+    fallback = df.reindex(columns=[factor['columns'][1] for factor in spec]).to_numpy(dtype=float)
+    return np.where(np.isnan(primary), fallback, primary)
+
+
+def raw_factors(df, spec=FACTOR_SPEC):
+    # Raw factor inputs; factors whose raw column is absent keep their upstream score
+    values = coalesce_factors(df, spec)
+    present = [i for i, factor in enumerate(spec) if factor['raw_col'] in df.columns]
+    values[:, present] = df[[spec[i]['raw_col'] for i in present]].to_numpy(dtype=float)
+    return values
+
+
+def _check_nan_policy(nan_policy):
+    if nan_policy not in ('propagate', 'omit'):
+        raise ValueError(f"nan_policy must be 'propagate' or 'omit', got {nan_policy!r}")
+
+
+def zscore_matrix(values, nan_policy='propagate', groups=None):
+    """Standardize every column of `values` at once (population std, like scipy's zscore).
+
+    With nan_policy='propagate' a column containing any NaN becomes all NaN, as
+    scipy.stats.zscore does; with 'omit' NaNs are ignored in the statistics.
+    With `groups` (one label per row, e.g. sector) each column is standardized
+    within each group instead, and NaN propagation is per group.
+    """
+    _check_nan_policy(nan_policy)
+    if groups is not None:
+        return _grouped_zscore(values, groups, nan_policy)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if nan_policy == 'omit':
+            counts = (~np.isnan(values)).sum(axis=0)
+            mean = np.nansum(values, axis=0) / counts
+            std = np.sqrt(np.nansum((values - mean) ** 2, axis=0) / counts)
+        else:
+            mean = values.mean(axis=0)
+            std = values.std(axis=0)
+        return (values - mean) / std
+
+
+def _grouped_zscore(values, groups, nan_policy):
+    # Sort rows by group once, then reduce every (group, factor) segment with
+    # np.add.reduceat, so all groups and factors are handled in a few array passes
+    if len(values) == 0:
+        return values.copy()
+    codes, _ = pd.factorize(np.asarray(groups, dtype=object), use_na_sentinel=False)
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    sizes = np.diff(np.r_[starts, len(values)])
+
+    x = values[order]
+    valid = ~np.isnan(x)
+    counts = np.add.reduceat(valid, starts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.add.reduceat(np.where(valid, x, 0.0), starts, axis=0) / counts
+        deviations = x - np.repeat(mean, sizes, axis=0)
+        std = np.sqrt(np.add.reduceat(np.where(valid, deviations ** 2, 0.0), starts, axis=0) / counts)
+        if nan_policy == 'propagate':
+            std[counts < sizes[:, None]] = np.nan
+        z = deviations / np.repeat(std, sizes, axis=0)
+
+    out = np.empty_like(z)
+    out[order] = z
+    return out
+
+
+def _group_quantiles(values, percentiles, groups):
+    # Percentiles of every factor from one np.nanpercentile call over the 2-D array
+    # (one call per group when grouped). Returns (row group codes, table) where
+    # table[p, g, k] is percentile p of factor k in group g.
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN factors give NaN quantiles
+        if groups is None:
+            table = np.nanpercentile(values, percentiles, axis=0)[:, None, :]
+            return np.zeros(len(values), dtype=np.intp), table
+        codes, uniques = pd.factorize(np.asarray(groups, dtype=object), use_na_sentinel=False)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        table = np.stack([np.nanpercentile(values[order[start:end]], percentiles, axis=0)
+                          for start, end in zip(bounds[:-1], bounds[1:])], axis=1)
+        return codes, table
+
+
+def _propagate_nans(result, values, codes):
+    # nan_policy='propagate' for the quantile methods: a factor with any NaN in a group is NaN there
+    nan_counts = np.zeros((codes.max() + 1, values.shape[1]))
+    np.add.at(nan_counts, codes, np.isnan(values))
+    result[nan_counts[codes] > 0] = np.nan
+    return result
+
+
+def standardize_matrix(values, method='zscore', nan_policy='propagate', groups=None,
+                       winsor_limits=(0.05, 0.95)):
+    """Standardize every factor column with one of METHODS.
+
+    'zscore' is the mean/std z-score; 'robust' scales by median and IQR (divided by
+    1.349 so it is comparable to a z-score); 'winsorized' clips each factor at the
+    `winsor_limits` quantiles before z-scoring.
+    """
+    _check_nan_policy(nan_policy)
+    if method == 'zscore':
+        return zscore_matrix(values, nan_policy=nan_policy, groups=groups)
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}, got {method!r}")
+    if len(values) == 0:
+        return values.copy()
+
+    low, high = winsor_limits
+    codes, table = _group_quantiles(values, [100 * low, 25, 50, 75, 100 * high], groups)
+    if method == 'robust':
+        # A zero IQR (e.g. a factor bunched at one value) has no scale, like std == 0 in zscore_matrix
+        iqr = table[3] - table[1]
+        scale = np.where(iqr > 0, iqr, np.nan) / IQR_TO_STD
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = (values - table[2][codes]) / scale[codes]
+        return _propagate_nans(result, values, codes) if nan_policy == 'propagate' else result
+
+    clipped = np.clip(values, table[0][codes], table[4][codes])
+    return zscore_matrix(clipped, nan_policy=nan_policy, groups=groups)
+
+
+def _row_nanmean(values):
+    # Row mean ignoring NaN; all-NaN rows give NaN without a RuntimeWarning
+    counts = (~np.isnan(values)).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, np.nansum(values, axis=1) / counts, np.nan)
+
+
+def score_factors(df, spec=FACTOR_SPEC, nan_policy='propagate', group_by=None, method='zscore',
+                  source='scores', winsor_limits=(0.05, 0.95)):
+    """Run the factor model over `df` and return a new frame with the scores appended.
+
+    Adds the coalesced factor columns, a z-column per factor with any data,
+    'zaggr', the group scores, 'Total Composite Z-score' and 'Difference'.
+    `group_by` names a column (e.g. 'FactSet Econ Sector') to z-score within.
+    `source='raw'` standardizes the raw inputs (e.g. 'B/P') instead of the
+    upstream IQR/W scores, and `method` selects the scaling (see standardize_matrix).
+    """
+    _check_nan_policy(nan_policy)
+    groups = None
+    if group_by is not None:
+        if group_by not in df.columns:
+            raise ValueError(f"'{group_by}' column not found for group-neutral scoring.")
+        groups = df[group_by].to_numpy()
+
+    if source not in ('scores', 'raw'):
+        raise ValueError(f"source must be 'scores' or 'raw', got {source!r}")
+
+    factor_names = [factor['output_col'] for factor in spec]
+    with instrumentation.span(f'factors.{source}'):
+        values = raw_factors(df, spec) if source == 'raw' else coalesce_factors(df, spec)
+
+    available = ~np.isnan(values).all(axis=0)
+    signs = np.array([-1.0 if factor['invert'] else 1.0 for factor in spec])
+    with instrumentation.span(f'factors.{method}'):
+        z_values = standardize_matrix(values[:, available] * signs[available], method=method,
+                                      nan_policy=nan_policy, groups=groups, winsor_limits=winsor_limits)
+    z_names = [z_column(name) for name, ok in zip(factor_names, available) if ok]
+    z_index = {name: i for i, name in enumerate(z_names)}
+
+    scores = {name: values[:, i] for i, name in enumerate(factor_names)}
+    scores.update({name: z_values[:, i] for i, name in enumerate(z_names)})
+    scores['zaggr'] = _row_nanmean(z_values)
+
+    group_values = []
+    for group_name, members in factor_groups(spec).items():
+        columns = [z_index[member] for member in members if member in z_index]
+        scores[group_name] = _row_nanmean(z_values[:, columns])
+        group_values.append(scores[group_name])
+    scores['Total Composite Z-score'] = _row_nanmean(np.column_stack(group_values)) if group_values else np.nan
+    if 'Final Model Score' in scores:
+        scores['Difference'] = scores['Final Model Score'] - scores['Total Composite Z-score']
+
+    # Build all new columns as one block and attach them with a single concat
+    with instrumentation.span('factors.assemble'):
+        block = pd.DataFrame(scores, index=df.index)
+        return pd.concat([df.drop(columns=block.columns, errors='ignore'), block], axis=1)
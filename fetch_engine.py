@@ -0,0 +1,224 @@
+import logging
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+
+logger = logging.getLogger(__name__)
+
+PERIOD_DAYS = {'1d': 1, '5d': 5, '1mo': 21, '3mo': 63, '6mo': 126, '1y': 252, '2y': 504, '5y': 1260}
+
+# Calendar span of each yfinance `period`, measured back from the latest bar
+PERIOD_OFFSETS = {
+    '1d': pd.DateOffset(days=1),
+    '5d': pd.DateOffset(days=5),
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5),
+}
+
+
+# Token-bucket rate limiter shared by all fetch workers
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        # Block until `tokens` are available; returns the time spent waiting. A request
+        # larger than the capacity waits for a full bucket and leaves it in debt, so the
+        # long-run rate still holds
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                needed = min(tokens, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return waited
+                delay = (needed - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def _exchange_dates(hist):
+    # yf.download drops the exchange timezone from daily bars (ignore_tz) while Ticker.history
+    # keeps it; both become naive exchange-local dates so histories from either can be mixed
+    if isinstance(hist.index, pd.DatetimeIndex) and hist.index.tz is not None:
+        return hist.tz_localize(None)
+    return hist
+
+
+# Yahoo Finance provider; uses one multi-ticker download per batch. yf.download still
+# makes one HTTP request per ticker, so each ticker is charged to the rate limiter
+class YFinanceProvider:
+    supports_batch = True
+    batch_endpoint = False
+
+    def history(self, tickers, period='1y', start=None):
+        import yfinance as yf
+
+        kwargs = {'start': start} if start is not None else {'period': period}
+        if len(tickers) == 1:
+            hist = _exchange_dates(yf.Ticker(tickers[0]).history(**kwargs))
+            return {tickers[0]: hist} if not hist.empty else {}
+
+        frame = yf.download(tickers, group_by='ticker', auto_adjust=True, actions=True,
+                            threads=False, progress=False, **kwargs)
+        histories = {}
+        for ticker in tickers:
+            if ticker not in frame.columns.get_level_values(0):
+                continue
+            hist = _exchange_dates(frame[ticker].dropna(how='all'))
+            if not hist.empty:
+                histories[ticker] = hist
+        return histories
+
+
+# Offline provider producing deterministic random-walk histories for testing and benchmarks;
+# simulates a true multi-ticker endpoint (one request per batch)
+class StubDataProvider:
+    supports_batch = True
+    batch_endpoint = True
+
+    def __init__(self, n_days=252, latency=0.0, failure_rate=0.0, seed=0):
+        self.n_days = n_days
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def history(self, tickers, period='1y', start=None):
+        with self._lock:
+            self.calls += 1
+            fail = self._rng.random() < self.failure_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise ConnectionError('stub provider: simulated failure')
+
+        histories = {ticker: self._make_history(ticker) for ticker in tickers}
+        if start is not None:
+            return {t: h.loc[h.index >= pd.Timestamp(start)] for t, h in histories.items()}
+        if period not in PERIOD_OFFSETS:
+            return histories
+        # Calendar-based like yfinance (and PriceCache), not a fixed bar count
+        return {t: h[h.index > h.index[-1] - PERIOD_OFFSETS[period]] for t, h in histories.items()}
+
+    def _make_history(self, ticker):
+        # Seed per ticker so every call for the same symbol sees the same path
+        rng = np.random.default_rng(zlib.crc32(ticker.encode()) + self.seed)
+        close = 50 * np.exp(np.cumsum(rng.normal(0.0004, 0.02, self.n_days)))
+        index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=self.n_days, name='Date')
+        return pd.DataFrame({
+            'Open': close * (1 + rng.normal(0, 0.005, self.n_days)),
+            'High': close * 1.01,
+            'Low': close * 0.99,
+            'Close': close,
+            'Volume': rng.integers(200_000, 5_000_000, self.n_days).astype(float),
+        }, index=index)
+
+
+def _fetch_batch(provider, batch, period, start, bucket, retries, backoff):
+    histories = {}
+    remaining = list(batch)
+    for attempt in range(retries + 1):
+        # One token per HTTP request: per batch for a real batch endpoint, else per ticker
+        cost = 1 if getattr(provider, 'batch_endpoint', False) else len(remaining)
+        instrumentation.count('fetch.rate_limit_wait_seconds', bucket.acquire(cost))
+        instrumentation.count('fetch.requests')
+        try:
+            with instrumentation.span('fetch.request'):
+                result = provider.history(remaining, period=period, start=start)
+        except Exception as e:
+            logger.warning(f"Fetch failed for {len(remaining)} tickers (attempt {attempt + 1}): {e}")
+            instrumentation.count('fetch.failed_requests')
+            result = {}
+        histories.update({t: h for t, h in result.items() if h is not None and not h.empty})
+        remaining = [t for t in remaining if t not in histories]
+        if not remaining or attempt == retries:
+            break
+        # Exponential backoff with jitter before retrying the tickers that failed
+        delay = backoff * 2 ** attempt * (1 + random.random())
+        instrumentation.count('fetch.backoff_seconds', delay)
+        time.sleep(delay)
+    return histories, remaining
+
+
+def fetch_histories(tickers, provider=None, period='1y', start=None, max_workers=8,
+                    batch_size=50, rate=2.0, burst=None, retries=3, backoff=1.0, progress=None):
+    """Fetch price histories for many tickers concurrently.
+
+    Tickers are grouped into batches (one request each when the provider supports
+    multi-ticker downloads), requests are spread over a thread pool and throttled
+    by a shared token bucket of `rate` HTTP requests per second (a batch costs one
+    token per ticker unless the provider has a real batch endpoint). Returns a dict of
+    ticker -> history; tickers that still fail after `retries` are left out.
+    """
+    provider = provider or YFinanceProvider()
+    if not getattr(provider, 'supports_batch', False):
+        batch_size = 1
+    if burst is None and not getattr(provider, 'batch_endpoint', False):
+        # Let one full batch through without waiting on an otherwise idle bucket
+        burst = max(rate, batch_size)
+    bucket = TokenBucket(rate, burst)
+    tickers = list(dict.fromkeys(tickers))
+    batches = [tickers[i:i + batch_size] for i in range(0, len(tickers), batch_size)]
+
+    histories = {}
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(_fetch_batch, provider, batch, period, start, bucket, retries, backoff)
+                   for batch in batches]
+        for future in as_completed(futures):
+            result, missing = future.result()
+            histories.update(result)
+            failed.extend(missing)
+            if progress is not None:
+                progress(len(histories), len(tickers))
+
+    instrumentation.count('fetch.tickers', len(histories))
+    if failed:
+        instrumentation.count('fetch.failed_tickers', len(failed))
+        logger.warning(f"Giving up on {len(failed)} tickers: {', '.join(sorted(failed)[:20])}")
+    return histories
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Measure fetch throughput against the stub data provider.')
+    parser.add_argument('--tickers', type=int, default=1500)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--rate', type=float, default=2.0)
+    parser.add_argument('--latency', type=float, default=0.5, help='simulated seconds per request')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    stub = StubDataProvider(latency=args.latency, failure_rate=args.failure_rate)
+    universe = [f"T{i:05d}" for i in range(args.tickers)]
+
+    started = time.perf_counter()
+    result = fetch_histories(universe, provider=stub, max_workers=args.workers,
+                             batch_size=args.batch_size, rate=args.rate, backoff=0.1)
+    elapsed = time.perf_counter() - started
+    print(f"Fetched {len(result)}/{len(universe)} tickers in {elapsed:.2f}s "
+          f"({len(result) / elapsed:.0f} tickers/s, {stub.calls} requests)")
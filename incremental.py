@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+from factor_engine import (FACTOR_SPEC, _check_nan_policy, _row_nanmean, coalesce_factors,
+                           factor_groups, z_column)
+
+
+class IncrementalScorer:
+    """Factor model that applies row inserts, updates and deletes as deltas.
+
+    Per-factor sufficient statistics (count, sum, sum of squares, NaN count) are
+    kept per standardization group, so a change of k rows costs O(k) and the
+    z-scores are only re-derived from the statistics when output is requested.
+    Rows are identified by `key_column` (CUSIP by default). Results match
+    factor_engine.score_factors on the same rows up to floating-point rounding;
+    call rebuild() to recompute the statistics exactly after many edits.
+    """
+
+    def __init__(self, spec=FACTOR_SPEC, key_column='CUSIP', nan_policy='propagate', group_by=None,
+                 capacity=1024):
+        _check_nan_policy(nan_policy)
+        self.spec = spec
+        self.key_column = key_column
+        self.nan_policy = nan_policy
+        self.group_by = group_by
+        self._signs = np.array([-1.0 if factor['invert'] else 1.0 for factor in spec])
+        self._names = [factor['output_col'] for factor in spec]
+
+        n_factors = len(spec)
+        self._values = np.full((capacity, n_factors), np.nan)
+        self._group_codes = np.zeros(capacity, dtype=np.intp)
+        self._slots = {}
+        self._free = list(range(capacity - 1, -1, -1))
+        self._group_index = {}
+        # Statistics are accumulated on values shifted by a fixed per-factor offset to
+        # keep sum-of-squares cancellation small
+        self._shift = None
+        self._count = np.zeros((0, n_factors))
+        self._sum = np.zeros((0, n_factors))
+        self._sumsq = np.zeros((0, n_factors))
+        self._nan_count = np.zeros((0, n_factors))
+        self._moments = None
+
+    @classmethod
+    def from_frame(cls, df, **kwargs):
+        kwargs.setdefault('capacity', max(1024, 2 * len(df)))
+        scorer = cls(**kwargs)
+        scorer.upsert(df)
+        return scorer
+
+    def __len__(self):
+        return len(self._slots)
+
+    # Storage helpers
+
+    def _grow(self, needed):
+        old = len(self._values)
+        new = max(needed, 2 * old)
+        self._values = np.vstack([self._values, np.full((new - old, self._values.shape[1]), np.nan)])
+        self._group_codes = np.concatenate([self._group_codes, np.zeros(new - old, dtype=np.intp)])
+        self._free.extend(range(new - 1, old - 1, -1))
+
+    def _codes_for(self, labels):
+        codes = np.empty(len(labels), dtype=np.intp)
+        for i, label in enumerate(labels):
+            label = None if pd.isna(label) else label
+            codes[i] = self._group_index.setdefault(label, len(self._group_index))
+        n_groups = len(self._group_index)
+        if n_groups > len(self._count):
+            extra = np.zeros((n_groups - len(self._count), self._count.shape[1]))
+            self._count, self._sum, self._sumsq, self._nan_count = (
+                np.vstack([stat, extra]) for stat in (self._count, self._sum, self._sumsq, self._nan_count))
+        return codes
+
+    def _accumulate(self, slots, sign):
+        # Add (sign=+1) or remove (sign=-1) the contribution of the rows in `slots`
+        values = self._values[slots] - self._shift
+        codes = self._group_codes[slots]
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        np.add.at(self._count, codes, sign * valid)
+        np.add.at(self._sum, codes, sign * filled)
+        np.add.at(self._sumsq, codes, sign * filled ** 2)
+        np.add.at(self._nan_count, codes, sign * ~valid)
+        self._moments = None
+
+    # Edits
+
+    def upsert(self, df):
+        """Insert rows with new keys and replace rows whose key already exists."""
+        df = df.drop_duplicates(self.key_column, keep='last')
+        keys = df[self.key_column].to_numpy()
+        values = coalesce_factors(df, self.spec) * self._signs
+        if self._shift is None:
+            counts = (~np.isnan(values)).sum(axis=0)
+            self._shift = np.where(counts > 0, np.nansum(values, axis=0) / np.maximum(counts, 1), 0.0)
+        if self.group_by is not None:
+            codes = self._codes_for(df[self.group_by].to_numpy())
+        else:
+            codes = self._codes_for([None] * len(df))
+
+        existing = np.array([self._slots.get(key, -1) for key in keys], dtype=np.intp)
+        updated = existing[existing >= 0]
+        if len(updated):
+            self._accumulate(updated, -1)
+
+        n_new = int((existing < 0).sum())
+        if n_new > len(self._free):
+            self._grow(len(self._slots) + n_new)
+        slots = existing.copy()
+        for i in np.flatnonzero(existing < 0):
+            slot = self._free.pop()
+            self._slots[keys[i]] = slot
+            slots[i] = slot
+
+        self._values[slots] = values
+        self._group_codes[slots] = codes
+        self._accumulate(slots, +1)
+
+    def delete(self, keys):
+        slots = np.array([self._slots.pop(key) for key in keys if key in self._slots], dtype=np.intp)
+        if len(slots):
+            self._accumulate(slots, -1)
+            self._values[slots] = np.nan
+            self._free.extend(slots.tolist())
+
+    def rebuild(self):
+        # Recompute the statistics from the stored rows (no drift from repeated deltas)
+        for stat in (self._count, self._sum, self._sumsq, self._nan_count):
+            stat.fill(0.0)
+        slots = np.fromiter(self._slots.values(), dtype=np.intp, count=len(self._slots))
+        if len(slots):
+            self._accumulate(slots, +1)
+
+    # Output
+
+    def _current_moments(self):
+        if self._moments is None:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = self._sum / self._count
+                variance = np.maximum(self._sumsq / self._count - mean ** 2, 0.0)
+                std = np.sqrt(variance)
+            if self.nan_policy == 'propagate':
+                std[self._nan_count > 0] = np.nan
+            self._moments = (mean + self._shift, std, self._count.sum(axis=0) > 0)
+        return self._moments
+
+    def scores(self, keys=None):
+        """Scores for `keys` (all rows when None) in the same columns score_factors appends."""
+        if keys is None:
+            keys = list(self._slots)
+        slots = np.array([self._slots[key] for key in keys], dtype=np.intp)
+        mean, std, available = self._current_moments()
+
+        values = self._values[slots]
+        codes = self._group_codes[slots]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z_values = ((values - mean[codes]) / std[codes])[:, available]
+        z_names = [z_column(name) for name, ok in zip(self._names, available) if ok]
+        z_index = {name: i for i, name in enumerate(z_names)}
+
+        result = {name: values[:, i] * self._signs[i] for i, name in enumerate(self._names)}
+        result.update({name: z_values[:, i] for i, name in enumerate(z_names)})
+        result['zaggr'] = _row_nanmean(z_values)
+        group_values = []
+        for group_name, members in factor_groups(self.spec).items():
+            result[group_name] = _row_nanmean(z_values[:, [z_index[m] for m in members if m in z_index]])
+            group_values.append(result[group_name])
+        result['Total Composite Z-score'] = _row_nanmean(np.column_stack(group_values)) if group_values else np.nan
+        if 'Final Model Score' in result:
+            result['Difference'] = result['Final Model Score'] - result['Total Composite Z-score']
+        return pd.DataFrame(result, index=pd.Index(keys, name=self.key_column))
@@ -0,0 +1,88 @@
+import os
+
+import pandas as pd
+
+from factor_engine import RAW_COLUMNS, SOURCE_COLUMNS
+
+# FactSet exports carry four banner rows above the header
+HEADER_ROW = 3
+BUY_LIST_COLUMN = 'In Buy List'
+
+ID_COLUMNS = ['Company Name', 'Exchange Name (VND)', 'CUSIP', 'FactSet Econ Sector',
+              'FactSet Ind', 'Gen Sec Type Desc']
+CATEGORY_COLUMNS = ['Exchange Name (VND)', 'FactSet Econ Sector', 'FactSet Ind', 'Gen Sec Type Desc']
+
+# Kept alongside the scores so scored snapshots can be backtested
+FORWARD_RETURN_COLUMNS = ['1 Mo Fwd Return', 'Calculated 1M Fwd Total Return']
+
+# Everything the factor model reads; the remaining export columns are never loaded
+MODEL_COLUMNS = ID_COLUMNS + [BUY_LIST_COLUMN] + SOURCE_COLUMNS + RAW_COLUMNS + FORWARD_RETURN_COLUMNS
+
+
+def _compact(df):
+    # float32 for numeric inputs (the factor engine computes in float64)
+    for col in df.columns:
+        if col not in ID_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+    return df
+
+
+def _filter_buy_list(chunk):
+    if BUY_LIST_COLUMN not in chunk.columns:
+        raise ValueError(f"'{BUY_LIST_COLUMN}' column not found in uploaded file.")
+    buy_list = pd.to_numeric(chunk[BUY_LIST_COLUMN], errors='coerce')
+    return _compact(chunk[buy_list > 0].copy())
+
+
+def _read_binary(source, file_extension, wanted):
+    # Arrow files are memory-mapped (paths) or wrapped without copying (uploads);
+    # columns are projected and the buy list filtered before converting to pandas
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    if file_extension == 'parquet':
+        parquet = pq.ParquetFile(source, memory_map=isinstance(source, (str, os.PathLike)))
+        table = parquet.read(columns=[col for col in parquet.schema_arrow.names if col in wanted])
+    else:
+        if isinstance(source, (str, os.PathLike)):
+            buffer = pa.memory_map(os.fspath(source))
+        else:
+            buffer = pa.BufferReader(pa.py_buffer(source.getvalue()))
+        table = pa.ipc.open_file(buffer).read_all()
+        table = table.select([col for col in table.column_names if col in wanted])
+
+    if BUY_LIST_COLUMN not in table.column_names:
+        raise ValueError(f"'{BUY_LIST_COLUMN}' column not found in uploaded file.")
+    table = table.filter(pc.fill_null(pc.greater(table[BUY_LIST_COLUMN], 0), False))
+    return _filter_buy_list(table.to_pandas())
+
+
+def read_export(source, file_extension, columns=None, chunksize=50_000):
+    """Read a FactSet export, keeping only buy-list rows and the model's columns.
+
+    CSV (tab-delimited) input is streamed in chunks and filtered per chunk, so
+    peak memory follows the buy-list size rather than the raw export size.
+    Arrow/Feather and Parquet files written by convert_export.py skip Excel parsing.
+    Raises ValueError for unsupported formats or a missing 'In Buy List' column.
+    """
+    wanted = set(columns or MODEL_COLUMNS) | {BUY_LIST_COLUMN}
+    usecols = lambda col: col in wanted
+
+    if file_extension == 'csv':
+        reader = pd.read_csv(source, header=HEADER_ROW, delimiter='\t', usecols=usecols,
+                             dtype={col: str for col in ID_COLUMNS}, chunksize=chunksize)
+        chunks = [_filter_buy_list(chunk) for chunk in reader]
+        data = pd.concat(chunks) if chunks else pd.DataFrame(columns=[BUY_LIST_COLUMN])
+    elif file_extension == 'xlsx':
+        data = _filter_buy_list(pd.read_excel(source, header=HEADER_ROW, usecols=usecols,
+                                              dtype={col: str for col in ID_COLUMNS}))
+    elif file_extension in ('arrow', 'feather', 'parquet'):
+        data = _read_binary(source, file_extension, wanted)
+    else:
+        raise ValueError("Unsupported file format. Please upload an Excel, CSV, Arrow or Parquet file.")
+
+    for col in CATEGORY_COLUMNS:
+        if col in data.columns:
+            data[col] = data[col].astype('category')
+    return data
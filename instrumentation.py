@@ -0,0 +1,198 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+# Off unless UES_INSTRUMENT is set (or enable() is called). While disabled, span()
+# returns a shared no-op context manager and count() returns immediately.
+_enabled = os.environ.get('UES_INSTRUMENT', '').lower() not in ('', '0', 'false', 'no')
+_NOOP = nullcontext()
+_local = threading.local()
+
+
+class Recorder:
+    """Thread-safe totals of span timings and counters."""
+
+    def __init__(self):
+        self.spans = {}     # name -> [calls, total seconds, max seconds]
+        self.counters = {}  # name -> value
+        self._lock = threading.Lock()
+
+    def add_span(self, name, elapsed):
+        with self._lock:
+            entry = self.spans.get(name)
+            if entry is None:
+                self.spans[name] = [1, elapsed, elapsed]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed
+                entry[2] = max(entry[2], elapsed)
+
+    def add_count(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'spans': {name: {'calls': calls, 'total_seconds': total, 'max_seconds': longest}
+                          for name, (calls, total, longest) in self.spans.items()},
+                'counters': dict(self.counters),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+
+
+# Cumulative totals for the whole process (what monitoring scrapes)
+totals = Recorder()
+
+
+def enabled():
+    return _enabled
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = bool(on)
+
+
+def _recorders():
+    # Process totals plus the current thread's run, if one is active
+    run_recorder = getattr(_local, 'run', None)
+    return (totals, run_recorder) if run_recorder is not None else (totals,)
+
+
+class _Span:
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        for recorder in _recorders():
+            recorder.add_span(self.name, elapsed)
+        return False
+
+
+def span(name):
+    """Context manager timing the enclosed block under `name`."""
+    return _Span(name) if _enabled else _NOOP
+
+
+def count(name, value=1):
+    """Add `value` to the counter `name`."""
+    if not _enabled:
+        return
+    for recorder in _recorders():
+        recorder.add_count(name, value)
+
+
+def timed(name):
+    """Decorator form of span()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def begin_run():
+    """Start collecting the spans and counters of one run (e.g. a Streamlit rerun) on this thread.
+
+    Returns the run's Recorder, or None when instrumentation is disabled. Work done
+    on other threads (e.g. fetch_engine workers) only reaches the process totals.
+    """
+    _local.run = Recorder() if _enabled else None
+    return _local.run
+
+
+@contextmanager
+def run():
+    previous = getattr(_local, 'run', None)
+    try:
+        yield begin_run()
+    finally:
+        _local.run = previous
+
+
+# ---------------------------------------------------------
+# Export
+# ---------------------------------------------------------
+
+def to_json(recorder=None, indent=2):
+    return json.dumps((recorder or totals).snapshot(), indent=indent, sort_keys=True)
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def to_prometheus(recorder=None, prefix='ues'):
+    """Prometheus text exposition format of the span and counter totals."""
+    snapshot = (recorder or totals).snapshot()
+    lines = []
+    span_metrics = [
+        ('span_calls_total', 'counter', 'Number of times the span was entered.', 'calls'),
+        ('span_seconds_total', 'counter', 'Total seconds spent in the span.', 'total_seconds'),
+        ('span_max_seconds', 'gauge', 'Longest single span duration in seconds.', 'max_seconds'),
+    ]
+    for metric, kind, help_text, field in span_metrics:
+        lines.append(f"# HELP {prefix}_{metric} {help_text}")
+        lines.append(f"# TYPE {prefix}_{metric} {kind}")
+        for name, values in sorted(snapshot['spans'].items()):
+            lines.append(f'{prefix}_{metric}{{span="{_label(name)}"}} {values[field]:.9g}')
+    lines.append(f"# HELP {prefix}_events_total Instrumentation counters.")
+    lines.append(f"# TYPE {prefix}_events_total counter")
+    for name, value in sorted(snapshot['counters'].items()):
+        lines.append(f'{prefix}_events_total{{name="{_label(name)}"}} {value:.9g}')
+    return '\n'.join(lines) + '\n'
+
+
+def write(path, recorder=None):
+    # .prom/.txt files get Prometheus text, anything else JSON
+    text = to_prometheus(recorder) if path.endswith(('.prom', '.txt')) else to_json(recorder)
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def summary_frame(recorder=None):
+    """Spans sorted by total time, as a DataFrame (milliseconds)."""
+    import pandas as pd
+
+    snapshot = (recorder or totals).snapshot()
+    rows = [{'stage': name, 'calls': values['calls'], 'total_ms': values['total_seconds'] * 1000,
+             'max_ms': values['max_seconds'] * 1000}
+            for name, values in snapshot['spans'].items()]
+    frame = pd.DataFrame(rows, columns=['stage', 'calls', 'total_ms', 'max_ms'])
+    return frame.sort_values('total_ms', ascending=False, ignore_index=True)
+
+
+def render_sidebar(recorder):
+    """Per-run breakdown and export buttons in the Streamlit sidebar."""
+    if recorder is None:
+        return
+    import streamlit as st
+
+    st.sidebar.subheader('Run timings')
+    st.sidebar.dataframe(summary_frame(recorder).round(2), hide_index=True)
+    counters = recorder.snapshot()['counters']
+    if counters:
+        st.sidebar.json(counters)
+    st.sidebar.download_button('Download metrics (JSON)', data=to_json(), file_name='ues_metrics.json',
+                               mime='application/json')
+    st.sidebar.download_button('Download metrics (Prometheus)', data=to_prometheus(),
+                               file_name='ues_metrics.prom', mime='text/plain')
@@ -0,0 +1,365 @@
+import asyncio
+import logging
+import random
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from fetch_engine import PERIOD_DAYS, PERIOD_OFFSETS
+from metrics import SP500_TICKER
+
+logger = logging.getLogger(__name__)
+
+
+class LiveMetrics:
+    """Rolling price metrics over a ring buffer of daily bars per ticker.
+
+    A quote for the ticker's current day revises its latest bar and adjusts the
+    10D/22D sums and the latest daily return in O(1); a quote for a later day
+    appends a new bar (overwriting the oldest) and recomputes that ticker's
+    window sums from the buffer. `metrics()` returns the same columns as
+    metrics.compute_panel_metrics over the buffered bars. Seeded histories are
+    trimmed to a calendar year like fetch_histories(period='1y'), and the
+    buffers grow to hold the longest of them (a year is often more than
+    `capacity` trading days).
+    """
+
+    def __init__(self, tickers, capacity=PERIOD_DAYS['1y'], std_window=126):
+        self.tickers = list(dict.fromkeys(tickers))
+        self.capacity = capacity
+        self.std_window = std_window
+        self._index = {ticker: i for i, ticker in enumerate(self.tickers)}
+        n = len(self.tickers)
+        self.close = np.full((n, capacity), np.nan)
+        self.volume = np.full((n, capacity), np.nan)
+        self.last = np.full(n, -1, dtype=np.intp)   # slot of each ticker's latest bar
+        self.count = np.zeros(n, dtype=np.intp)     # bars held, up to capacity
+        self.last_day = np.full(n, np.datetime64('NaT'), dtype='datetime64[D]')
+        # Window sums over the latest min(count, window) bars
+        self._close_sum = {10: np.zeros(n), 22: np.zeros(n)}
+        self._volume_sum = {10: np.zeros(n), 22: np.zeros(n)}
+        self._return_sum = np.zeros(n)
+        self._return_sumsq = np.zeros(n)
+        self._return_count = np.zeros(n)
+
+    def seed(self, histories):
+        """Fill the buffers from daily histories (e.g. from PriceCache.refresh or fetch_histories)."""
+        year = {}
+        for ticker, hist in histories.items():
+            if ticker in self._index and not hist.empty:
+                year[ticker] = hist[hist.index > hist.index[-1] - PERIOD_OFFSETS['1y']]
+        longest = max((len(hist) for hist in year.values()), default=0)
+        if longest > self.capacity:
+            self._grow(longest)
+
+        rows = []
+        for ticker, hist in year.items():
+            i = self._index[ticker]
+            k = len(hist)
+            self.close[i, :k] = hist['Close'].to_numpy(dtype=float)
+            self.volume[i, :k] = hist['Volume'].to_numpy(dtype=float)
+            self.close[i, k:] = np.nan
+            self.volume[i, k:] = np.nan
+            self.last[i] = k - 1
+            self.count[i] = k
+            self.last_day[i] = np.datetime64(pd.Timestamp(hist.index[-1]).date(), 'D')
+            rows.append(i)
+        self._recompute(np.array(rows, dtype=np.intp))
+
+    # Buffer helpers
+
+    def _grow(self, capacity):
+        # Unroll every ring into slots 0..count-1 of wider buffers; the window sums are unchanged
+        start = (self.last - self.count + 1) % self.capacity
+        slots = (start[:, None] + np.arange(self.capacity)) % self.capacity
+        held = np.arange(self.capacity) < self.count[:, None]
+        for name in ('close', 'volume'):
+            wider = np.full((len(self.tickers), capacity), np.nan)
+            wider[:, :self.capacity] = np.where(held, np.take_along_axis(getattr(self, name), slots, axis=1), np.nan)
+            setattr(self, name, wider)
+        self.last = self.count - 1
+        self.capacity = capacity
+
+    def _slots(self, rows, depth):
+        # Slots of the 1st..depth-th latest bars of `rows`, and which of them exist
+        back = np.arange(depth)
+        slots = (self.last[rows, None] - back) % self.capacity
+        return slots, back < self.count[rows, None]
+
+    def _recompute(self, rows):
+        # Exact window sums for `rows` from the buffer (after seeding or a new day)
+        if len(rows) == 0:
+            return
+        depth = min(self.capacity, max(22, self.std_window))
+        slots, present = self._slots(rows, depth)
+        close = np.where(present, self.close[rows[:, None], slots], np.nan)
+        volume = np.where(present, self.volume[rows[:, None], slots], np.nan)
+        for window in (10, 22):
+            self._close_sum[window][rows] = np.nansum(close[:, :window], axis=1)
+            self._volume_sum[window][rows] = np.nansum(volume[:, :window], axis=1)
+        # close[:, k] is the (k+1)-th latest bar, so returns run newest first
+        returns = close[:, :self.std_window - 1] / close[:, 1:self.std_window] - 1
+        valid = ~np.isnan(returns)
+        self._return_sum[rows] = np.where(valid, returns, 0.0).sum(axis=1)
+        self._return_sumsq[rows] = np.where(valid, returns ** 2, 0.0).sum(axis=1)
+        self._return_count[rows] = valid.sum(axis=1)
+
+    def _previous_close(self, rows):
+        with np.errstate(invalid='ignore'):
+            previous = self.close[rows, (self.last[rows] - 1) % self.capacity]
+        return np.where(self.count[rows] >= 2, previous, np.nan)
+
+    # Updates
+
+    def apply(self, quotes):
+        """Apply {ticker: (timestamp, last price, cumulative day volume)}; returns the rows updated."""
+        quotes = {t: q for t, q in quotes.items() if t in self._index and q is not None}
+        if not quotes:
+            return np.array([], dtype=np.intp)
+        rows = np.fromiter((self._index[t] for t in quotes), dtype=np.intp, count=len(quotes))
+        days = np.array([np.datetime64(pd.Timestamp(q[0]).date(), 'D') for q in quotes.values()])
+        price = np.fromiter((q[1] for q in quotes.values()), dtype=float, count=len(quotes))
+        volume = np.fromiter((q[2] for q in quotes.values()), dtype=float, count=len(quotes))
+
+        empty = self.count[rows] == 0
+        with np.errstate(invalid='ignore'):
+            same_day = ~empty & (days == self.last_day[rows])
+            new_day = empty | (days > self.last_day[rows])
+        # Quotes older than the latest bar are ignored
+        self._revise(rows[same_day], price[same_day], volume[same_day])
+        self._append(rows[new_day], days[new_day], price[new_day], volume[new_day])
+        return rows[same_day | new_day]
+
+    def _revise(self, rows, price, volume):
+        # Replace the latest bar in place; only the deltas enter the window sums
+        if len(rows) == 0:
+            return
+        slots = self.last[rows]
+        close_delta = price - self.close[rows, slots]
+        volume_delta = volume - self.volume[rows, slots]
+        previous = self._previous_close(rows)
+        old_return = self.close[rows, slots] / previous - 1
+        new_return = price / previous - 1
+
+        self.close[rows, slots] = price
+        self.volume[rows, slots] = volume
+        for window in (10, 22):
+            self._close_sum[window][rows] += close_delta
+            self._volume_sum[window][rows] += volume_delta
+        has_return = ~np.isnan(previous)
+        self._return_sum[rows] += np.where(has_return, new_return - old_return, 0.0)
+        self._return_sumsq[rows] += np.where(has_return, new_return ** 2 - old_return ** 2, 0.0)
+
+    def _append(self, rows, days, price, volume):
+        # Start a new bar; the oldest bar falls out of a full buffer
+        if len(rows) == 0:
+            return
+        self.last[rows] = (self.last[rows] + 1) % self.capacity
+        self.close[rows, self.last[rows]] = price
+        self.volume[rows, self.last[rows]] = volume
+        self.count[rows] = np.minimum(self.count[rows] + 1, self.capacity)
+        self.last_day[rows] = days
+        self._recompute(rows)
+
+    # Output
+
+    def _bar(self, k):
+        # k-th latest close for every ticker (NaN where fewer than k bars)
+        rows = np.arange(len(self.tickers))
+        values = self.close[rows, (self.last - (k - 1)) % self.capacity]
+        return np.where(self.count >= k, values, np.nan)
+
+    def metrics(self):
+        rows = np.arange(len(self.tickers))
+        latest = self._bar(1)
+        oldest = self.close[rows, (self.last - (self.count - 1)) % self.capacity]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self._return_sum / self._return_count
+            std = np.sqrt(np.maximum(self._return_sumsq / self._return_count - mean ** 2, 0.0))
+            std = np.where(self._return_count > 0, np.minimum(std * np.sqrt(252) * 100, 100), np.nan)
+            last_12_months_return = np.where(self.count > 0, (latest / oldest - 1) * 100, np.nan)
+            adv = {window: np.where(self.count >= window, self._volume_sum[window] / window, np.nan)
+                   for window in (10, 22)}
+            close_mean = {window: np.where(self.count >= window, self._close_sum[window] / window, np.nan)
+                          for window in (10, 22)}
+            last_month = (latest / self._bar(30) - 1) * 100
+
+        sp500 = np.nan
+        if SP500_TICKER in self._index:
+            sp500 = last_12_months_return[self._index[SP500_TICKER]]
+        return pd.DataFrame({
+            'Latest Price': latest,
+            '180-Day Annualized Std Dev': std,
+            'Simple Total Return (USD) Last Month': last_month,
+            'Last 12 Months Total Return': last_12_months_return,
+            'Last 12 Months S&P 500 Total Return': sp500,
+            'Last 12 Month Excess Return': last_12_months_return - sp500,
+            '22D ADV ($MM)': adv[22] * close_mean[22] / 1e6,
+            '10D ADV ($MM)': adv[10] * close_mean[10] / 1e6,
+            '10D ADV Shares (MM)': adv[10] / 1e6,
+            '22D ADV Shares (MM)': adv[22] / 1e6,
+        }, index=pd.Index(self.tickers, name='Ticker'))
+
+
+# ---------------------------------------------------------
+# Quote feeds: async callables returning {ticker: (timestamp, price, day volume)}
+# ---------------------------------------------------------
+
+class FakeQuoteFeed:
+    """Deterministic random-walk quotes for testing the refresh loop offline.
+
+    Each call advances a simulated clock by `step`, so a long enough run crosses
+    into new trading days. `latency` (seconds) and `failure_rate` simulate the network.
+    """
+
+    def __init__(self, start_prices=None, start=None, step=pd.Timedelta(minutes=1), latency=0.0,
+                 failure_rate=0.0, seed=0):
+        self.start_prices = dict(start_prices or {})
+        self.clock = pd.Timestamp(start) if start is not None else pd.Timestamp.now().floor('min')
+        self.step = pd.Timedelta(step)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.calls = 0
+        self._prices = {}
+        self._volumes = {}
+        self._days = {}
+        self._rng = random.Random(seed)
+
+    def advance(self):
+        self.clock += self.step
+
+    async def __call__(self, tickers):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self._rng.random() < self.failure_rate:
+            raise ConnectionError('fake feed: simulated failure')
+        quotes = {}
+        for ticker in tickers:
+            rng = np.random.default_rng([zlib.crc32(ticker.encode()), self.seed, self.calls])
+            price = self._prices.get(ticker, self.start_prices.get(ticker, 50.0))
+            price *= np.exp(rng.normal(0.0, 0.002))
+            # Cumulative volume restarts each day
+            day = self.clock.normalize()
+            volume = self._volumes.get(ticker, 0.0) if self._days.get(ticker) == day else 0.0
+            volume += float(rng.integers(1_000, 20_000))
+            self._prices[ticker], self._volumes[ticker], self._days[ticker] = price, volume, day
+            quotes[ticker] = (self.clock, price, volume)
+        return quotes
+
+
+class YFinanceQuoteFeed:
+    # Latest one-minute bar per ticker; the blocking download runs in the default executor
+    async def __call__(self, tickers):
+        return await asyncio.get_running_loop().run_in_executor(None, self._download, list(tickers))
+
+    def _download(self, tickers):
+        import yfinance as yf
+
+        frame = yf.download(tickers, period='1d', interval='1m', group_by='ticker', threads=False,
+                            progress=False)
+        quotes = {}
+        for ticker in tickers:
+            if ticker not in frame.columns.get_level_values(0):
+                continue
+            bars = frame[ticker].dropna(subset=['Close'])
+            if not bars.empty:
+                quotes[ticker] = (bars.index[-1], float(bars['Close'].iloc[-1]), float(bars['Volume'].sum()))
+        return quotes
+
+
+# ---------------------------------------------------------
+# Refresh loop
+# ---------------------------------------------------------
+
+class LiveRefresher:
+    """Poll `feed` for the whole universe every `interval` seconds and update `live`.
+
+    Tickers are requested in batches of `batch_size` with at most `max_in_flight`
+    requests outstanding; a failed batch is logged and retried on the next tick.
+    `on_update(live, rows)` is called after each tick with the rows that changed.
+    """
+
+    def __init__(self, live, feed, interval=60.0, batch_size=100, max_in_flight=8, on_update=None):
+        self.live = live
+        self.feed = feed
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.on_update = on_update
+        self.ticks = 0
+        self._stopped = False
+
+    async def _fetch(self, semaphore, batch):
+        async with semaphore:
+            try:
+                return await self.feed(batch)
+            except Exception as e:
+                logger.warning(f"Quote request failed for {len(batch)} tickers: {e}")
+                instrumentation.count('live.failed_requests')
+                return {}
+
+    async def tick(self):
+        tickers = self.live.tickers
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        batches = [tickers[i:i + self.batch_size] for i in range(0, len(tickers), self.batch_size)]
+        with instrumentation.span('live.poll'):
+            results = await asyncio.gather(*(self._fetch(semaphore, batch) for batch in batches))
+        quotes = {}
+        for result in results:
+            quotes.update(result)
+        with instrumentation.span('live.apply'):
+            rows = self.live.apply(quotes)
+        instrumentation.count('live.quotes', len(quotes))
+        self.ticks += 1
+        if self.on_update is not None:
+            self.on_update(self.live, rows)
+        return rows
+
+    async def run(self, iterations=None):
+        self._stopped = False
+        while not self._stopped and (iterations is None or self.ticks < iterations):
+            started = time.monotonic()
+            await self.tick()
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def stop(self):
+        self._stopped = True
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from fetch_engine import StubDataProvider, fetch_histories
+
+    parser = argparse.ArgumentParser(description='Run the live metrics refresh against a fake quote feed.')
+    parser.add_argument('--tickers', type=int, default=1500)
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between ticks')
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.05, help='simulated seconds per quote request')
+    parser.add_argument('--max-in-flight', type=int, default=8)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    universe = [f"T{i:05d}" for i in range(args.tickers)] + [SP500_TICKER]
+    histories = fetch_histories(universe, provider=StubDataProvider(), rate=1000)
+    live = LiveMetrics(universe)
+    live.seed(histories)
+    feed = FakeQuoteFeed({t: h['Close'].iloc[-1] for t, h in histories.items()}, latency=args.latency,
+                         start=max(h.index[-1] for h in histories.values()) + pd.Timedelta(hours=10))
+
+    def report(live, rows):
+        feed.advance()
+        frame = live.metrics()
+        print(f"tick {refresher.ticks}: {len(rows)} tickers updated, "
+              f"median 22D ADV ${frame['22D ADV ($MM)'].median():.1f}MM")
+
+    refresher = LiveRefresher(live, feed, interval=args.interval, max_in_flight=args.max_in_flight,
+                              on_update=report)
+    started = time.perf_counter()
+    asyncio.run(refresher.run(args.iterations))
+    print(f"{args.iterations} ticks over {len(universe)} tickers in {time.perf_counter() - started:.2f}s")
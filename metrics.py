@@ -1,102 +1,180 @@
 
-import yfinance as yf
+import os
+
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-import time
 
-def get_stock_data(ticker, period='1y'):
-    stock = yf.Ticker(ticker)
-    hist = stock.history(period=period)
-    return hist
+import instrumentation
+from fetch_engine import YFinanceProvider, fetch_histories
+from price_cache import PriceCache
+
+SP500_TICKER = '^GSPC'
 
-def get_latest_price(ticker):
-    stock = yf.Ticker(ticker)
-    hist = stock.history(period='1d')
+def get_stock_data(ticker, period='1y', provider=None, cache=None):
+    if cache is not None:
+        return cache.refresh([ticker], provider=provider, period=period).get(ticker, pd.DataFrame())
+    provider = provider or YFinanceProvider()
+    return provider.history([ticker], period=period).get(ticker, pd.DataFrame())
+
+def get_latest_price(ticker, provider=None, cache=None):
+    hist = get_stock_data(ticker, period='1d', provider=provider, cache=cache)
     return hist['Close'].iloc[-1] if not hist.empty else None
 
+# ---------------------------------------------------------
+# Panel kernels: dates x tickers matrices, one column per ticker
+# ---------------------------------------------------------
+
+def build_panel(histories):
+    # Stack per-ticker histories into wide close and volume matrices
+    close = pd.DataFrame({ticker: hist['Close'] for ticker, hist in histories.items()})
+    volume = pd.DataFrame({ticker: hist['Volume'] for ticker, hist in histories.items()})
+    return close, volume.reindex(index=close.index, columns=close.columns)
+
+def _right_align(close, volume=None):
+    # Shift each ticker's bars to the bottom of the matrix (stable, so bar order is kept),
+    # which makes row -1 every ticker's latest bar and row -k its k-th latest bar
+    close = np.asarray(close, dtype=float)
+    order = np.argsort(~np.isnan(close), axis=0, kind='stable')
+    close = np.take_along_axis(close, order, axis=0)
+    if volume is not None:
+        volume = np.take_along_axis(np.asarray(volume, dtype=float), order, axis=0)
+    return close, volume
+
+def _annualized_std_dev(close, window=None):
+    if window is not None:
+        close = close[-window:]
+    returns = close[1:] / close[:-1] - 1
+    counts = (~np.isnan(returns)).sum(axis=0)
+    squares = np.nansum((returns - np.nansum(returns, axis=0) / np.maximum(counts, 1)) ** 2, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.where(counts > 0, np.sqrt(squares / counts), np.nan)
+    return np.minimum(std * np.sqrt(252) * 100, 100)
+
+def _total_return(close, lookback=None):
+    counts = (~np.isnan(close)).sum(axis=0)
+    if lookback is None:
+        # From each ticker's first available bar
+        first = np.clip(len(close) - counts, 0, len(close) - 1)
+        base = close[first, np.arange(close.shape[1])]
+    elif len(close) >= lookback:
+        base = close[-lookback]
+    else:
+        base = np.full(close.shape[1], np.nan)
+    return (close[-1] / base - 1) * 100
+
+def _rolling_mean_last(values, window):
+    # Last value of a rolling(window).mean(); NaN when fewer than `window` bars
+    if len(values) < window:
+        return np.full(values.shape[1], np.nan)
+    return values[-window:].mean(axis=0)
+
+def compute_panel_metrics(close, volume, sp500_return=None, std_window=126):
+    tickers = list(close.columns)
+    c, v = _right_align(close.to_numpy(), volume.to_numpy())
+    if len(c) == 0:
+        c = np.full((1, len(tickers)), np.nan)
+        v = np.full((1, len(tickers)), np.nan)
+
+    last_12_months_return = _total_return(c)
+    close_10, close_22 = _rolling_mean_last(c, 10), _rolling_mean_last(c, 22)
+    volume_10, volume_22 = _rolling_mean_last(v, 10), _rolling_mean_last(v, 22)
+    sp500 = np.nan if sp500_return is None else sp500_return
+
+    return pd.DataFrame({
+        'Latest Price': c[-1],
+        '180-Day Annualized Std Dev': _annualized_std_dev(c, window=std_window),  # 126 trading days ~ 6 months
+        'Simple Total Return (USD) Last Month': _total_return(c, lookback=30),
+        'Last 12 Months Total Return': last_12_months_return,
+        'Last 12 Months S&P 500 Total Return': sp500,
+        'Last 12 Month Excess Return': last_12_months_return - sp500,
+        '22D ADV ($MM)': volume_22 * close_22 / 1e6,
+        '10D ADV ($MM)': volume_10 * close_10 / 1e6,
+        '10D ADV Shares (MM)': volume_10 / 1e6,
+        '22D ADV Shares (MM)': volume_22 / 1e6,
+    }, index=pd.Index(tickers, name='Ticker'))
+
+def _single_close(hist):
+    return hist['Close'].to_numpy(dtype=float).reshape(-1, 1)
+
 def get_180day_annualized_std_dev(hist):
     if not hist.empty:
-        daily_returns = hist['Close'].pct_change().dropna()
-        annualized_std = np.std(daily_returns) * np.sqrt(252) * 100
-        return min(annualized_std, 100)
+        return float(_annualized_std_dev(_single_close(hist))[0])
     return None
 
 def get_simple_total_return_last_month(hist):
     if not hist.empty and len(hist) >= 30:
-        last_month_return = (hist['Close'].iloc[-1] / hist['Close'].iloc[-30] - 1) * 100
-        return last_month_return
+        return float(_total_return(_single_close(hist), lookback=30)[0])
     return None
 
 def get_last_12_months_total_return(hist):
     if not hist.empty:
-        return (hist['Close'].iloc[-1] / hist['Close'].iloc[0] - 1) * 100
+        return float(_total_return(_single_close(hist))[0])
     return None
 
-def get_sp500_last_12_months_return():
-    sp500 = yf.Ticker('^GSPC')
-    hist = sp500.history(period='1y')
-    if not hist.empty:
-        return (hist['Close'].iloc[-1] / hist['Close'].iloc[0] - 1) * 100
-    return None
+@instrumentation.timed('metrics.sp500')
+def get_sp500_last_12_months_return(provider=None, cache=None):
+    hist = get_stock_data(SP500_TICKER, period='1y', provider=provider, cache=cache)
+    return get_last_12_months_total_return(hist)
 
-def get_all_metrics(tickers):
-    sp500_return = get_sp500_last_12_months_return()
-    
-    results = []
-    total_tickers = len(tickers)
-    
-    for i, ticker in enumerate(tickers, 1):
-        try:
-            stock_data = get_stock_data(ticker, period='1y')
-            
-            if stock_data.empty:
-                print(f"Skipping {ticker} due to insufficient data")
-                continue
-
-            latest_price = stock_data['Close'].iloc[-1]
-            std_dev = get_180day_annualized_std_dev(stock_data.tail(126))  # 126 trading days ~ 6 months
-            last_month_return = get_simple_total_return_last_month(stock_data)
-            last_12_months_return = get_last_12_months_total_return(stock_data)
-            
-            if latest_price is None or std_dev is None or last_month_return is None or last_12_months_return is None:
-                print(f"Skipping {ticker} due to insufficient data")
-                continue
-            
-            excess_return = last_12_months_return - sp500_return if sp500_return is not None else None
-
-            results.append({
-                'Ticker': ticker,
-                'Latest Price': latest_price,
-                '180-Day Annualized Std Dev': std_dev,
-                'Simple Total Return (USD) Last Month': last_month_return,
-                'Last 12 Months Total Return': last_12_months_return,
-                'Last 12 Months S&P 500 Total Return': sp500_return,
-                'Last 12 Month Excess Return': excess_return,
-                '22D ADV ($MM)': (stock_data['Volume'].rolling(22).mean() * stock_data['Close'].rolling(22).mean()).iloc[-1] / 1e6,
-                '10D ADV ($MM)': (stock_data['Volume'].rolling(10).mean() * stock_data['Close'].rolling(10).mean()).iloc[-1] / 1e6,
-                '10D ADV Shares (MM)': stock_data['Volume'].rolling(10).mean().iloc[-1] / 1e6,
-                '22D ADV Shares (MM)': stock_data['Volume'].rolling(22).mean().iloc[-1] / 1e6,
-            })
-            
-            print(f"Processed {i}/{total_tickers}: {ticker}")
-        except Exception as e:
-            print(f"Error processing {ticker}: {str(e)}")
-        
-        # Add a small delay to avoid hitting rate limits
-        time.sleep(1)
-    
-    return pd.DataFrame(results)
+def get_all_metrics(tickers, provider=None, max_workers=8, batch_size=50, rate=2.0, retries=3, cache=None):
+    provider = provider or YFinanceProvider()
+
+    # Download every history (and the S&P 500 benchmark) up front with bounded concurrency
+    # and rate limiting; with a cache only the bars after each ticker's last cached date are fetched
+    fetch_kwargs = dict(max_workers=max_workers, batch_size=batch_size, rate=rate, retries=retries)
+    universe = list(dict.fromkeys(list(tickers) + [SP500_TICKER]))
+    with instrumentation.span('metrics.fetch'):
+        if cache is not None:
+            histories = cache.refresh(universe, provider=provider, period='1y', **fetch_kwargs)
+        else:
+            histories = fetch_histories(universe, provider=provider, period='1y', **fetch_kwargs)
+    sp500_return = get_last_12_months_total_return(histories.get(SP500_TICKER, pd.DataFrame()))
+
+    with instrumentation.span('metrics.build_panel'):
+        close, volume = build_panel({t: histories[t] for t in tickers if t in histories})
+    with instrumentation.span('metrics.compute'):
+        metrics = compute_panel_metrics(close, volume, sp500_return=sp500_return)
+
+    required = ['Latest Price', '180-Day Annualized Std Dev',
+                'Simple Total Return (USD) Last Month', 'Last 12 Months Total Return']
+    insufficient = metrics[required].isna().any(axis=1)
+    skipped = [t for t in tickers if t not in histories] + metrics.index[insufficient].tolist()
+    if skipped:
+        print(f"Skipping {len(skipped)} tickers due to insufficient data: {', '.join(skipped[:20])}")
+
+    results = metrics[~insufficient].reset_index()
+    instrumentation.count('metrics.skipped_tickers', len(skipped))
+    print(f"Processed {len(results)}/{len(tickers)} tickers")
+    return results
 
 if __name__ == "__main__":
-    from app import get_tickers  # Import function from app.py
+    import argparse
+    from screener import FixtureSource, get_tickers
+
+    parser = argparse.ArgumentParser(description='Compute price metrics for the screener universe.')
+    parser.add_argument('--cache-dir', default='price_cache', help='on-disk price history cache')
+    parser.add_argument('--no-cache', action='store_true', help='download full histories without caching')
+    parser.add_argument('--screener-fixture', default=os.environ.get('SCREENER_FIXTURE'),
+                        help='local screener CSV to take the ticker universe from instead of finviz')
+    parser.add_argument('--metrics-out', help='enable instrumentation and write it here (.json or .prom)')
+    args = parser.parse_args()
+    if args.metrics_out:
+        instrumentation.enable()
     
-    tickers = get_tickers()
+    tickers = get_tickers(source=FixtureSource(args.screener_fixture) if args.screener_fixture else None)
     if tickers:
-        result_df = get_all_metrics(tickers)
+        cache = None
+        if not args.no_cache:
+            cache = PriceCache(args.cache_dir)
+            # Drop symbols that have left the universe
+            cache.evict(list(tickers) + [SP500_TICKER])
+        result_df = get_all_metrics(tickers, cache=cache)
         
         # Save results to CSV
         result_df.to_csv('stock_metrics.csv', index=False)
         print("Results saved to stock_metrics.csv")
+        if args.metrics_out:
+            print(instrumentation.summary_frame().round(1).to_string(index=False))
+            instrumentation.write(args.metrics_out)
     else:
-        print("No tickers found. Please run the Streamlit app first to fetch stock data.")
+        print("No tickers found. Check the screener filters or the --screener-fixture file.")
@@ -0,0 +1,82 @@
+import io
+import os
+
+import instrumentation
+from export import export_bytes, export_columns
+from factor_engine import score_factors
+from ingest import read_export
+from ranking import RankingIndex
+from result_cache import LRUCache, content_hash
+from shared_store import SharedStore
+
+FINAL_COLUMNS = ['Company Name', 'Exchange Name (VND)', 'CUSIP', 'FactSet Econ Sector',
+                 'FactSet Ind', 'Gen Sec Type Desc', 'Final Model Score',
+                 'Profitability Group', 'Growth Group', 'Payout Group', 'Safety Group',
+                 'Total Composite Z-score', 'Difference']
+
+# One bounded cache per stage, keyed by the upload's content hash. Cached frames are
+# shared between reruns and sessions, so callers must treat them as read-only.
+read_cache = LRUCache(maxsize=8)
+export_cache = LRUCache(maxsize=4)
+ranking_cache = LRUCache(maxsize=8)
+
+# Scored datasets are held once per process as memory-mapped Arrow files and handed
+# to sessions as read-only SharedFrame views (UES_STORE_DIR overrides the temp dir)
+score_store = SharedStore(os.environ.get('UES_STORE_DIR'),
+                          max_bytes=int(float(os.environ.get('UES_STORE_MB', 2048)) * 1024 ** 2))
+
+
+def _cached(cache, stage, key, compute):
+    # Memoize one stage; the compute time is recorded as span 'pipeline.<stage>'
+    def timed_compute():
+        instrumentation.count(f'pipeline.{stage}.miss')
+        with instrumentation.span(f'pipeline.{stage}'):
+            return compute()
+    return cache.get_or_compute(key, timed_compute)
+
+
+def load_export(content, file_extension, digest=None):
+    digest = digest or content_hash(content)
+    return _cached(read_cache, 'read_export', (digest, file_extension),
+                   lambda: read_export(io.BytesIO(content), file_extension))
+
+
+def scored_view(content, file_extension, digest=None, **options):
+    """SharedFrame with the scored export; hold it for as long as the session shows the data.
+
+    `options` are passed to factor_engine.score_factors and are part of the store key.
+    """
+    digest = digest or content_hash(content)
+
+    def build():
+        instrumentation.count('pipeline.score_factors.miss')
+        with instrumentation.span('pipeline.score_factors'):
+            return score_factors(load_export(content, file_extension, digest), **options)
+    return score_store.acquire((digest, file_extension, tuple(sorted(options.items()))), build)
+
+
+def ranking_index(content, file_extension, digest=None, **options):
+    # The index holds its own reference to the scored frame until the cache drops it
+    digest = digest or content_hash(content)
+
+    def build():
+        view = scored_view(content, file_extension, digest, **options)
+        return RankingIndex(view.frame, handle=view)
+    return _cached(ranking_cache, 'ranking_index', (digest, file_extension, tuple(sorted(options.items()))), build)
+
+
+def final_frame(scored):
+    return scored[[col for col in FINAL_COLUMNS if col in scored.columns]]
+
+
+def export_file(content, file_extension, digest=None, fmt='csv.gz', **options):
+    # Final columns plus z-columns, written in chunks; only built when a download is requested
+    digest = digest or content_hash(content)
+
+    def build():
+        # Hold the scored frame only while the bytes are written; the result is a copy
+        with scored_view(content, file_extension, digest, **options) as view:
+            scored = view.frame
+            return export_bytes(scored[export_columns(scored, FINAL_COLUMNS)], fmt)
+    return _cached(export_cache, f'export_{fmt}', (digest, file_extension, fmt, tuple(sorted(options.items()))),
+                   build)
@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from fetch_engine import PERIOD_OFFSETS, YFinanceProvider, fetch_histories
+
+logger = logging.getLogger(__name__)
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+
+def _trim(hist, period):
+    # Keep the bars a fresh `history(period=...)` download would return
+    if hist.empty or period not in PERIOD_OFFSETS:
+        return hist
+    return hist[hist.index > hist.index[-1] - PERIOD_OFFSETS[period]]
+
+
+class PriceCache:
+    """On-disk daily bar cache, one memory-mapped NumPy record file per ticker.
+
+    `refresh` downloads only the bars from each ticker's last cached date onwards
+    (the last bar is refetched in case it was a partial intraday bar) and appends
+    them; tickers with no cache are downloaded in full.
+    """
+
+    def __init__(self, directory='price_cache', retention='2y'):
+        self.directory = directory
+        self.retention = retention
+        os.makedirs(directory, exist_ok=True)
+        self._manifest_path = os.path.join(directory, 'manifest.json')
+        self._manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                return json.load(f)
+        return {}
+
+    def _write_manifest(self):
+        tmp_path = self._manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self._manifest_path)
+
+    def _path(self, ticker):
+        return os.path.join(self.directory, quote(ticker, safe='') + '.npy')
+
+    def tickers(self):
+        return sorted(self._manifest)
+
+    def load(self, ticker):
+        path = self._path(ticker)
+        if ticker not in self._manifest or not os.path.exists(path):
+            return pd.DataFrame()
+        records = np.load(path, mmap_mode='r')
+        index = pd.DatetimeIndex(records['date'], name='Date')
+        tz = self._manifest[ticker].get('tz')
+        if tz:
+            # Entries written from timezone-aware bars come back as exchange-local dates,
+            # matching what YFinanceProvider returns now
+            index = index.tz_localize('UTC').tz_convert(tz).tz_localize(None)
+        return pd.DataFrame({col: np.array(records[col]) for col in records.dtype.names if col != 'date'},
+                            index=index)
+
+    def store(self, ticker, hist):
+        columns = [col for col in PRICE_COLUMNS if col in hist.columns]
+        records = np.empty(len(hist), dtype=[('date', 'M8[ns]')] + [(col, 'f8') for col in columns])
+        index = hist.index
+        tz = str(index.tz) if index.tz is not None else None
+        records['date'] = (index.tz_convert('UTC').tz_localize(None) if tz else index).to_numpy('M8[ns]')
+        for col in columns:
+            records[col] = hist[col].to_numpy(dtype=float)
+
+        # Write to a temporary file first so a crash never leaves a truncated cache entry
+        path = self._path(ticker)
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, records)
+        os.replace(path + '.tmp', path)
+        self._manifest[ticker] = {'tz': tz, 'last': index[-1].isoformat() if len(index) else None}
+
+    def refresh(self, tickers, provider=None, period='1y', **fetch_kwargs):
+        """Bring `tickers` up to date and return their histories trimmed to `period`."""
+        provider = provider or YFinanceProvider()
+        cached = {ticker: self.load(ticker) for ticker in tickers}
+
+        # Group tickers by the date to resume from so each group is one batched fetch
+        resume = {}
+        for ticker, hist in cached.items():
+            if hist.empty or hist.index[-1] <= pd.Timestamp.now(tz=hist.index.tz) - PERIOD_OFFSETS[self.retention]:
+                resume.setdefault(None, []).append(ticker)
+            else:
+                resume.setdefault(hist.index[-1].strftime('%Y-%m-%d'), []).append(ticker)
+
+        updated = []
+        for start, group in resume.items():
+            if start is None:
+                fresh = fetch_histories(group, provider=provider, period=self.retention, **fetch_kwargs)
+            else:
+                fresh = fetch_histories(group, provider=provider, start=start, **fetch_kwargs)
+            for ticker, new_bars in fresh.items():
+                old = cached[ticker]
+                if start is not None and not old.empty:
+                    new_bars = pd.concat([old[old.index < new_bars.index[0]], new_bars])
+                cached[ticker] = _trim(new_bars, self.retention)
+                self.store(ticker, cached[ticker])
+                updated.append(ticker)
+
+        if updated:
+            self._write_manifest()
+        logger.info(f"Price cache: refreshed {len(updated)}/{len(tickers)} tickers")
+        return {ticker: _trim(hist, period) for ticker, hist in cached.items() if not hist.empty}
+
+    def evict(self, keep):
+        """Delete cached tickers that are no longer in `keep`; returns the evicted symbols."""
+        keep = set(keep)
+        evicted = [ticker for ticker in self._manifest if ticker not in keep]
+        for ticker in evicted:
+            path = self._path(ticker)
+            if os.path.exists(path):
+                os.remove(path)
+            del self._manifest[ticker]
+        if evicted:
+            self._write_manifest()
+        return evicted
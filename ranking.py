@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+SCORE_COLUMNS = ['Total Composite Z-score', 'Difference', 'Final Model Score', 'Profitability Group',
+                 'Growth Group', 'Payout Group', 'Safety Group', 'zaggr']
+
+
+class RankingIndex:
+    """Top/bottom-N lookup over a scored universe, built once per scoring run.
+
+    Each score column gets a descending argsort permutation (NaNs excluded) and
+    each sector a boolean row bitmap; per (column, sector) permutations are
+    derived on first use and cached, so repeat queries are a slice of a
+    precomputed array. `handle` (a shared_store.SharedFrame for `df`) is kept
+    for the life of the index so the shared frame stays referenced.
+    """
+
+    def __init__(self, df, score_columns=None, sector_column='FactSet Econ Sector', handle=None):
+        self.frame = df
+        self.handle = handle
+        self.score_columns = [col for col in (score_columns or SCORE_COLUMNS) if col in df.columns]
+        self._orders = {}
+        for col in self.score_columns:
+            values = df[col].to_numpy(dtype=float)
+            order = np.argsort(-values, kind='stable')  # NaNs sort last
+            self._orders[col] = order[:int((~np.isnan(values)).sum())]
+
+        self._bitmaps = {}
+        if sector_column in df.columns:
+            codes, sectors = pd.factorize(df[sector_column])
+            self._bitmaps = {sector: codes == i for i, sector in enumerate(sectors)}
+        self._sector_orders = {}
+
+    def sectors(self):
+        return sorted(self._bitmaps, key=str)
+
+    def positions(self, column, sector=None):
+        """Row positions ranked from highest to lowest `column`, optionally within `sector`."""
+        if column not in self._orders:
+            raise KeyError(f"'{column}' is not an indexed score column.")
+        if sector is None:
+            return self._orders[column]
+        key = (column, sector)
+        if key not in self._sector_orders:
+            if sector not in self._bitmaps:
+                raise KeyError(f"Unknown sector '{sector}'.")
+            order = self._orders[column]
+            self._sector_orders[key] = order[self._bitmaps[sector][order]]
+        return self._sector_orders[key]
+
+    def top_positions(self, column, n=50, sector=None, ascending=False):
+        order = self.positions(column, sector)
+        return order[::-1][:n] if ascending else order[:n]
+
+    def top(self, column, n=50, sector=None, ascending=False, columns=None):
+        """The `n` highest (or lowest with ascending=True) rows by `column`."""
+        rows = self.frame.iloc[self.top_positions(column, n, sector, ascending)]
+        return rows[[col for col in columns if col in rows.columns]] if columns else rows
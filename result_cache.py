@@ -0,0 +1,70 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_hash(data):
+    # Cache key for uploaded file contents
+    return hashlib.sha256(data).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe, size-bounded mapping that evicts the least recently used entry.
+
+    Works inside and outside Streamlit: a module-level instance survives script
+    reruns and is shared by every session of the server process. With `ttl`
+    (seconds) entries older than that are treated as missing.
+    """
+
+    def __init__(self, maxsize=8, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries and not self._expired(self._entries[key][0])
+
+    def _expired(self, stored_at):
+        return self.ttl is not None and time.monotonic() - stored_at > self.ttl
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry[0]):
+                self._entries.pop(key, None)
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute, *args, **kwargs):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            # Computed outside the lock; concurrent misses on one key may both compute
+            value = compute(*args, **kwargs)
+            self.put(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
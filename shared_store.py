@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+INDEX_COLUMN = '__index__'
+
+
+def _to_table(df):
+    import pyarrow as pa
+
+    # Float columns keep NaN as a value rather than an Arrow null, so they can be
+    # mapped back into pandas without a copy
+    arrays = [pa.array(df[col].to_numpy()) if df[col].dtype.kind == 'f' else pa.Array.from_pandas(df[col])
+              for col in df.columns]
+    arrays.append(pa.Array.from_pandas(df.index.to_series()))
+    return pa.Table.from_arrays(arrays, names=[str(col) for col in df.columns] + [INDEX_COLUMN])
+
+
+class _Entry:
+    __slots__ = ('path', 'nbytes', 'frame', 'refs')
+
+    def __init__(self, path, nbytes, frame):
+        self.path = path
+        self.nbytes = nbytes
+        self.frame = frame
+        self.refs = 0
+
+
+class SharedFrame:
+    """A session's handle on a dataset held by a SharedStore.
+
+    `frame` is shared with every other holder and must not be modified (its
+    numeric columns are read-only views of the memory-mapped file). The
+    reference is dropped by release(), on leaving a `with` block, or when the
+    handle is garbage-collected (e.g. when a Streamlit session ends).
+    """
+
+    def __init__(self, store, key, entry):
+        self.key = key
+        self.frame = entry.frame
+        self._finalizer = weakref.finalize(self, store._release, entry)
+
+    def release(self):
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+class SharedStore:
+    """Process-wide store of immutable DataFrames backed by memory-mapped Arrow files.
+
+    Each key is computed once and written to `directory` as an Arrow IPC file;
+    every session then reads the same mapped pages through a SharedFrame, so
+    memory does not grow with the number of users. Entries are reference
+    counted and, once unreferenced, evicted least recently used first when
+    the files exceed `max_bytes`.
+    """
+
+    def __init__(self, directory=None, max_bytes=2 * 1024 ** 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._owns_directory = directory is None
+        self._entries = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        if self.directory is None:
+            # Created on first use so importing the module has no side effects
+            self.directory = tempfile.mkdtemp(prefix='ues_store_')
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, hashlib.sha256(repr(key).encode()).hexdigest()[:32] + '.arrow')
+
+    def _write(self, key, df):
+        import pyarrow as pa
+
+        path = self._path(key)
+        tmp_path = path + '.tmp'
+        table = _to_table(df)
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+
+        mapped = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        frame = mapped.drop_columns([INDEX_COLUMN]).to_pandas(split_blocks=True)
+        frame.index = pd.Index(mapped.column(INDEX_COLUMN).to_pandas()).rename(df.index.name)
+        return _Entry(path, os.path.getsize(path), frame)
+
+    def acquire(self, key, compute, *args, **kwargs):
+        """Return a SharedFrame for `key`, computing the DataFrame with `compute` if needed."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return self._checkout(key, entry)
+            building = self._building.setdefault(key, threading.Lock())
+
+        # One session builds the entry; concurrent requests for the same key wait for it
+        with building:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    return self._checkout(key, entry)
+            try:
+                entry = self._write(key, compute(*args, **kwargs))
+            except BaseException:
+                with self._lock:
+                    self._building.pop(key, None)
+                raise
+            # Publish the entry and drop the build marker together, so no request can
+            # find neither and start a second build
+            with self._lock:
+                self._building.pop(key, None)
+                self._entries[key] = entry
+                handle = self._checkout(key, entry)
+                self._evict()
+                return handle
+
+    def _checkout(self, key, entry):
+        # Caller holds the lock
+        entry.refs += 1
+        self._entries.move_to_end(key)
+        return SharedFrame(self, key, entry)
+
+    def _release(self, entry):
+        with self._lock:
+            entry.refs -= 1
+            self._evict()
+
+    def _evict(self):
+        # Caller holds the lock
+        total = sum(entry.nbytes for entry in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry.refs > 0:
+                continue
+            del self._entries[key]
+            total -= entry.nbytes
+            try:
+                # Frames still held elsewhere keep their mapping after the file is removed
+                os.remove(entry.path)
+            except OSError as e:
+                logger.warning(f"Could not remove {entry.path}: {e}")
+        if total > self.max_bytes:
+            logger.info(f"Shared store over budget ({total / 1e6:.0f}MB); all entries are in use")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': sum(entry.nbytes for entry in self._entries.values()),
+                'references': sum(entry.refs for entry in self._entries.values()),
+            }
+
+    def clear(self):
+        # Drop every entry regardless of references and remove a store-owned directory
+        with self._lock:
+            self._entries.clear()
+            if self._owns_directory and self.directory is not None:
+                shutil.rmtree(self.directory, ignore_errors=True)
+                self.directory = None
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from backtest import _ranks, build_panel, run_backtest
+
+
+def tied_panel(seed=0, shape=(40, 30)):
+    # Integer scores so most dates have ties, with gaps in both arrays
+    rng = np.random.default_rng(seed)
+    scores = rng.integers(0, 5, shape).astype(float)
+    scores[rng.random(shape) < 0.2] = np.nan
+    returns = rng.normal(size=shape).round(1)
+    returns[rng.random(shape) < 0.1] = np.nan
+    return scores, returns
+
+
+def test_average_ranks_match_pandas():
+    scores, _ = tied_panel()
+    expected = pd.DataFrame(scores).rank(axis=1, method='average').to_numpy() - 1
+    np.testing.assert_array_equal(_ranks(scores, ties='average'), expected)
+
+
+def test_ordinal_ranks_are_a_permutation():
+    scores, _ = tied_panel()
+    ranks = _ranks(scores)
+    present = ~np.isnan(scores)
+    for row, mask in zip(ranks, present):
+        assert sorted(row[mask]) == list(range(mask.sum()))
+
+
+def test_ic_is_spearman_with_ties():
+    scores, returns = tied_panel(seed=1)
+    ic = run_backtest(pd.RangeIndex(len(scores)), scores, returns)['ic']
+    for date in range(len(scores)):
+        # Spearman's rho is the Pearson correlation of the average ranks
+        ranks = pd.DataFrame({'score': scores[date], 'return': returns[date]}).dropna().rank()
+        assert np.isclose(ic[date], ranks['score'].corr(ranks['return']))
+
+
+def test_build_panel_drops_rows_without_a_key(caplog):
+    snapshot = pd.DataFrame({'CUSIP': ['A', 'B', None], 'Total Composite Z-score': [1.0, 2.0, 99.0]})
+    dates, assets, panel = build_panel({pd.Timestamp('2024-01-31'): snapshot}, ['Total Composite Z-score'])
+    assert list(assets) == ['A', 'B']
+    np.testing.assert_array_equal(panel['Total Composite Z-score'], [[1.0, 2.0]])
+    assert 'Dropping 1 rows with no CUSIP' in caplog.text
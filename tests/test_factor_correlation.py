@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import factset_frame
+from factor_correlation import WEIGHT_METHODS, composite_weights, factor_covariance, z_columns
+from factor_engine import score_factors
+
+
+@pytest.fixture(scope='module')
+def scored():
+    return score_factors(factset_frame(2000, seed=2))
+
+
+def test_matches_pandas_pairwise(scored):
+    columns = z_columns(scored)
+    result = factor_covariance(scored)
+    np.testing.assert_allclose(result['cov'].to_numpy(), scored[columns].cov().to_numpy(), rtol=1e-9)
+    np.testing.assert_allclose(result['corr'].to_numpy(), scored[columns].corr().to_numpy(), rtol=1e-9)
+
+
+@pytest.mark.parametrize('method', WEIGHT_METHODS)
+def test_empty_factor_is_dropped(scored, method):
+    empty = z_columns(scored)[0]
+    result = factor_covariance(scored.assign(**{empty: np.nan}), shrinkage='ledoit-wolf')
+    assert empty not in result['cov'].index
+    weights = composite_weights(result['cov'], method)
+    assert weights.sum() == pytest.approx(1.0)
+    assert (weights > 0).all()
+
+
+@pytest.mark.parametrize('method', WEIGHT_METHODS)
+def test_undefined_covariance_drops_one_factor(scored, method):
+    cov = factor_covariance(scored)['cov']
+    cov.iloc[0, 1] = cov.iloc[1, 0] = cov.iloc[0, 2] = cov.iloc[2, 0] = np.nan
+    weights = composite_weights(cov, method)
+    assert weights.iloc[0] == 0
+    assert (weights.iloc[1:] > 0).all()
+    assert weights.sum() == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize('method', WEIGHT_METHODS)
+def test_nothing_usable_gives_nan_weights(method):
+    cov = pd.DataFrame(np.full((3, 3), np.nan), index=list('abc'), columns=list('abc'))
+    assert composite_weights(cov, method).isna().all()
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import factset_frame
+from factor_engine import score_factors, standardize_matrix, zscore_matrix
+
+
+@pytest.mark.parametrize('nan_policy', ['propagate', 'omit'])
+@pytest.mark.parametrize('groups', [None, np.array(['a'] * 5 + ['b'] * 5)])
+def test_robust_zero_iqr_is_nan(nan_policy, groups):
+    # Second factor is bunched at one value in every group (an outlier each), so its IQR is 0
+    values = np.column_stack([np.arange(10.0), [3, 3, 3, 3, 9, 3, 3, 3, 3, 0]])
+    robust = standardize_matrix(values, method='robust', nan_policy=nan_policy, groups=groups)
+    assert not np.isinf(robust).any()
+    assert np.isnan(robust[:, 1]).all()
+    assert np.isfinite(robust[:, 0]).all()
+    assert np.isnan(zscore_matrix(np.full((4, 1), 3.0), nan_policy=nan_policy)).all()
+
+
+@pytest.mark.parametrize('method', ['robust', 'winsorized'])
+def test_scores_are_never_infinite(method):
+    df = factset_frame(500, seed=3)
+    df['B/P'] = 0.0  # a raw factor with no spread
+    scored = score_factors(df, source='raw', method=method, nan_policy='omit')
+    numeric = scored.select_dtypes('number').to_numpy()
+    assert not np.isinf(numeric).any()
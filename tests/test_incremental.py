@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import SECTORS, factset_frame
+from factor_engine import score_factors
+from incremental import IncrementalScorer
+
+MODES = [(nan_policy, group_by) for nan_policy in ('propagate', 'omit')
+         for group_by in (None, 'FactSet Econ Sector')]
+
+
+def assert_matches_batch(scorer, df):
+    # Every column the scorer produces must equal score_factors on the same rows
+    expected = score_factors(df, nan_policy=scorer.nan_policy, group_by=scorer.group_by).set_index('CUSIP')
+    actual = scorer.scores()
+    assert sorted(actual.index) == sorted(expected.index)
+    expected = expected.loc[actual.index, actual.columns]
+    np.testing.assert_allclose(actual.to_numpy(dtype=float), expected.to_numpy(dtype=float),
+                               rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+@pytest.fixture
+def universe():
+    return factset_frame(2000, seed=1)
+
+
+@pytest.mark.parametrize('nan_policy, group_by', MODES)
+def test_from_frame_matches_score_factors(universe, nan_policy, group_by):
+    scorer = IncrementalScorer.from_frame(universe, nan_policy=nan_policy, group_by=group_by)
+    assert_matches_batch(scorer, universe)
+
+
+@pytest.mark.parametrize('nan_policy, group_by', MODES)
+def test_updates_inserts_and_group_moves(universe, nan_policy, group_by):
+    base, extra = universe.iloc[:1500], universe.iloc[1500:]
+    scorer = IncrementalScorer.from_frame(base, nan_policy=nan_policy, group_by=group_by, capacity=16)
+
+    # Revised values, some rows moved to another sector, and new rows (forces growth)
+    changed = base.iloc[::7].copy()
+    changed['Value Score (IQR)'] = changed['Value Score (IQR)'] * 2 + 1
+    changed['FactSet Econ Sector'] = np.roll(changed['FactSet Econ Sector'].to_numpy(), 1)
+    scorer.upsert(pd.concat([changed, extra]))
+
+    current = pd.concat([base.drop(changed.index), changed, extra])
+    assert len(scorer) == len(current)
+    assert_matches_batch(scorer, current)
+
+
+@pytest.mark.parametrize('nan_policy, group_by', MODES)
+def test_delete_and_rebuild(universe, nan_policy, group_by):
+    scorer = IncrementalScorer.from_frame(universe, nan_policy=nan_policy, group_by=group_by)
+    removed = universe['CUSIP'].iloc[::3].tolist()
+    scorer.delete(removed + ['not-a-cusip'])
+    remaining = universe[~universe['CUSIP'].isin(removed)]
+    assert_matches_batch(scorer, remaining)
+
+    scorer.rebuild()
+    assert_matches_batch(scorer, remaining)
+
+
+def test_deleted_slots_are_reused(universe):
+    scorer = IncrementalScorer.from_frame(universe.iloc[:100], capacity=100)
+    scorer.delete(universe['CUSIP'].iloc[:50])
+    scorer.upsert(universe.iloc[100:150])
+    assert len(scorer) == 100
+    assert len(scorer._values) == 100
+    assert_matches_batch(scorer, universe.iloc[50:150])
+
+
+def test_upsert_keeps_last_duplicate(universe):
+    rows = universe.iloc[:200]
+    scorer = IncrementalScorer.from_frame(rows)
+    duplicate = rows.iloc[[0]].assign(**{'Value Score (IQR)': 5.0})
+    scorer.upsert(pd.concat([rows.iloc[[0]], duplicate]))
+    assert_matches_batch(scorer, pd.concat([rows.iloc[1:], duplicate]))
+
+
+def test_groups_emptied_by_deletes(universe):
+    scorer = IncrementalScorer.from_frame(universe, group_by='FactSet Econ Sector', nan_policy='omit')
+    gone = universe['FactSet Econ Sector'] == SECTORS[0]
+    scorer.delete(universe.loc[gone, 'CUSIP'])
+    assert_matches_batch(scorer, universe[~gone])
@@ -0,0 +1,73 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fetch_engine import StubDataProvider, fetch_histories
+from live_refresh import FakeQuoteFeed, LiveMetrics, LiveRefresher
+from metrics import SP500_TICKER, compute_panel_metrics, get_all_metrics
+
+TICKERS = [f"T{i:05d}" for i in range(5)]
+
+
+@pytest.fixture
+def histories():
+    # More than a year of bars, so the calendar-year trim decides the window
+    provider = StubDataProvider(n_days=400)
+    return provider, fetch_histories(TICKERS + [SP500_TICKER], provider=provider, rate=1e6)
+
+
+def test_seeded_metrics_match_get_all_metrics(histories):
+    provider, fetched = histories
+    assert max(len(hist) for hist in fetched.values()) > 252
+    live = LiveMetrics(TICKERS + [SP500_TICKER])
+    live.seed(fetched)
+
+    expected = get_all_metrics(TICKERS, provider=provider, rate=1e6).set_index('Ticker')
+    actual = live.metrics().loc[TICKERS, expected.columns]
+    pd.testing.assert_frame_equal(actual, expected, check_exact=False, rtol=1e-9)
+
+
+def test_seed_trims_longer_histories_to_a_calendar_year(histories):
+    _, fetched = histories
+    full = StubDataProvider(n_days=400).history(TICKERS, period='max')
+    live = LiveMetrics(TICKERS)
+    live.seed(full)
+    assert (live.count == len(fetched[TICKERS[0]])).all()
+    np.testing.assert_allclose(live.metrics()['Latest Price'], [full[t]['Close'].iloc[-1] for t in TICKERS])
+
+
+def test_growing_a_wrapped_buffer_keeps_bar_order(histories):
+    _, fetched = histories
+    live = LiveMetrics(TICKERS, capacity=30, std_window=20)
+    live.seed({t: fetched[t].iloc[-30:] for t in TICKERS})
+    # Wrap the ring, then grow it; the metrics must match the same bars in a flat buffer
+    day = fetched[TICKERS[0]].index[-1]
+    for k in range(1, 8):
+        live.apply({t: (day + pd.Timedelta(days=k), 40.0 + k, 1e6) for t in TICKERS})
+    before = live.metrics()
+    live._grow(64)
+    pd.testing.assert_frame_equal(live.metrics(), before)
+    live.apply({t: (day + pd.Timedelta(days=8), 50.0, 2e6) for t in TICKERS})
+    assert live.metrics()['Latest Price'].eq(50.0).all()
+
+
+def test_quotes_match_recomputing_from_the_buffer(histories):
+    _, fetched = histories
+    live = LiveMetrics(TICKERS, std_window=126)
+    live.seed(fetched)
+    feed = FakeQuoteFeed({t: fetched[t]['Close'].iloc[-1] for t in TICKERS},
+                         start=fetched[TICKERS[0]].index[-1] + pd.Timedelta(hours=10), step=pd.Timedelta(hours=6))
+    refresher = LiveRefresher(live, feed, interval=0, on_update=lambda live, rows: feed.advance())
+    asyncio.run(refresher.run(iterations=12))
+
+    # Rebuild the same bars as flat histories and score them with the batch kernel
+    rows = np.arange(len(TICKERS))
+    order = (live.last[:, None] - live.count[:, None] + 1 + np.arange(live.capacity)) % live.capacity
+    close = pd.DataFrame(np.take_along_axis(live.close[rows], order, axis=1).T, columns=TICKERS)
+    volume = pd.DataFrame(np.take_along_axis(live.volume[rows], order, axis=1).T, columns=TICKERS)
+    expected = compute_panel_metrics(close, volume)
+    actual = live.metrics()
+    columns = [col for col in expected.columns if 'S&P' not in col and 'Excess' not in col]
+    pd.testing.assert_frame_equal(actual[columns], expected[columns], check_exact=False, rtol=1e-9)
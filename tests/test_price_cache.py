@@ -0,0 +1,63 @@
+import sys
+import types
+
+import pandas as pd
+import pytest
+
+from fetch_engine import StubDataProvider, YFinanceProvider, fetch_histories
+from metrics import build_panel
+from price_cache import PriceCache
+
+
+@pytest.fixture
+def fake_yfinance(monkeypatch):
+    # Mimics the installed yfinance: Ticker.history keeps the exchange timezone, while
+    # yf.download returns naive daily bars (ignore_tz)
+    stub = StubDataProvider(n_days=400)
+
+    class Ticker:
+        def __init__(self, symbol):
+            self.symbol = symbol
+
+        def history(self, period='1mo', start=None):
+            hist = stub.history([self.symbol], period=period, start=start)[self.symbol]
+            return hist.tz_localize('America/New_York')
+
+    def download(tickers, period='1mo', start=None, **kwargs):
+        return pd.concat(stub.history(tickers, period=period, start=start), axis=1)
+
+    module = types.SimpleNamespace(Ticker=Ticker, download=download)
+    monkeypatch.setitem(sys.modules, 'yfinance', module)
+    return module
+
+
+def fetch(tickers, **kwargs):
+    return fetch_histories(tickers, provider=YFinanceProvider(), rate=1e6, backoff=0, **kwargs)
+
+
+def test_single_and_batched_fetches_share_one_index_type(fake_yfinance):
+    # A batch of two through yf.download and a batch of one through Ticker.history
+    histories = fetch(['A', 'B', 'C'], batch_size=2)
+    assert {hist.index.tz for hist in histories.values()} == {None}
+    close, volume = build_panel(histories)
+    assert sorted(close.columns) == ['A', 'B', 'C']
+    assert close.notna().all().all() and len(close) == len(histories['A'])
+
+
+def test_cache_refresh_mixes_single_and_batched_groups(fake_yfinance, tmp_path):
+    cache = PriceCache(str(tmp_path), retention='1y')
+    first = cache.refresh(['A', 'B'], provider=YFinanceProvider(), rate=1e6)
+
+    # An entry cached from a timezone-aware single-ticker download before the fix
+    cache.store('C', fake_yfinance.Ticker('C').history(period='1y').iloc[:-5])
+    cache._write_manifest()
+
+    # 'A' and 'B' resume as one batched group, 'C' as a group of one, 'D' is downloaded in full
+    refreshed = cache.refresh(['A', 'B', 'C', 'D'], provider=YFinanceProvider(), rate=1e6)
+    assert sorted(refreshed) == ['A', 'B', 'C', 'D']
+    assert {hist.index.tz for hist in refreshed.values()} == {None}
+    assert refreshed['A'].index.equals(first['A'].index)
+    assert refreshed['C'].index.equals(refreshed['D'].index)
+
+    close, _ = build_panel(refreshed)
+    assert close.notna().all().all()
@@ -0,0 +1,130 @@
+import gc
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from shared_store import SharedStore  # noqa: E402
+
+
+def frame(n=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'score': rng.normal(size=n), 'name': [f'n{i}' for i in range(n)]},
+                        index=pd.RangeIndex(n, name='row'))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SharedStore(str(tmp_path), max_bytes=10 ** 9)
+    yield store
+    store.clear()
+
+
+def test_round_trip_is_read_only(store):
+    df = frame()
+    with store.acquire('a', lambda: df) as view:
+        pd.testing.assert_frame_equal(view.frame, df, check_index_type=False)
+        assert view.frame.index.name == 'row'
+        with pytest.raises(ValueError):
+            view.frame['score'].to_numpy()[0] = 1.0
+
+
+def test_references_follow_handles(store):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return frame()
+
+    first = store.acquire('a', compute)
+    second = store.acquire('a', compute)
+    assert len(calls) == 1
+    assert second.frame is first.frame
+    assert store.stats()['references'] == 2
+
+    first.release()
+    first.release()  # releasing twice only drops one reference
+    assert store.stats()['references'] == 1
+    del second
+    gc.collect()
+    assert store.stats() == {'entries': 1, 'bytes': store.stats()['bytes'], 'references': 0}
+
+
+def test_eviction_skips_referenced_entries(store):
+    views = {key: store.acquire(key, frame, seed=i) for i, key in enumerate('abc')}
+    size = store.stats()['bytes'] // 3
+    paths = {key: store._entries[key].path for key in views}
+    store.max_bytes = 2 * size
+
+    # 'a' is least recently used but still held, so 'b' goes once it is released
+    views['b'].release()
+    assert 'b' not in store._entries and not os.path.exists(paths['b'])
+    assert 'a' in store._entries and views['a'].frame['score'].notna().all()
+
+    store.max_bytes = size
+    views['c'].release()
+    assert list(store._entries) == ['a']
+    store.max_bytes = 0
+    views['a'].release()
+    assert store.stats()['entries'] == 0
+
+
+def test_concurrent_requests_build_once(store):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return frame()
+
+    handles = []
+    threads = [threading.Thread(target=lambda: handles.append(store.acquire('a', compute))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert store.stats()['references'] == 8
+    assert not store._building
+
+
+def test_failed_build_can_be_retried(store):
+    def broken():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        store.acquire('a', broken)
+    assert not store._building and store.stats()['entries'] == 0
+    with store.acquire('a', frame) as view:
+        assert len(view.frame) == 1000
+
+
+def test_ranking_index_holds_a_reference(monkeypatch, tmp_path):
+    import pipeline
+    from benchmarks.synthetic import factset_frame, write_export
+    from result_cache import LRUCache
+
+    monkeypatch.setattr(pipeline, 'score_store', SharedStore(str(tmp_path)))
+    monkeypatch.setattr(pipeline, 'ranking_cache', LRUCache(maxsize=1))
+    monkeypatch.setattr(pipeline, 'export_cache', LRUCache(maxsize=1))
+    write_export(factset_frame(300), tmp_path / 'export.csv')
+    content = (tmp_path / 'export.csv').read_bytes()
+
+    index = pipeline.ranking_index(content, 'csv')
+    assert pipeline.score_store.stats()['references'] == 1
+    pipeline.export_file(content, 'csv', fmt='csv.gz')
+    assert pipeline.score_store.stats()['references'] == 1  # the export's reference is dropped
+
+    del index
+    pipeline.ranking_cache.clear()
+    gc.collect()
+    assert pipeline.score_store.stats()['references'] == 0
+    pipeline.score_store.clear()
@@ -0,0 +1,97 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from factor_engine import METHODS, score_factors
+from ingest import read_export
+from pipeline import final_frame
+
+INPUT_EXTENSIONS = ('csv', 'xlsx', 'arrow', 'feather', 'parquet')
+
+
+def process_file(path, output_dir, final_only=False, **options):
+    """Score one export and write `<name>_processed.csv`; returns per-stage timings.
+
+    `options` are passed to factor_engine.score_factors.
+    """
+    timings = {}
+    started = time.perf_counter()
+    data = read_export(path, path.rsplit('.', 1)[-1].lower())
+    timings['read'] = time.perf_counter() - started
+
+    mark = time.perf_counter()
+    scored = score_factors(data, **options)
+    if final_only:
+        scored = final_frame(scored)
+    timings['score'] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    output = os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0] + '_processed.csv')
+    scored.to_csv(output, index=False)
+    timings['write'] = time.perf_counter() - mark
+    timings['total'] = time.perf_counter() - started
+    return {'input': path, 'output': output, 'rows': len(scored), 'timings': timings}
+
+
+def find_exports(input_dir):
+    return sorted(os.path.join(input_dir, name) for name in os.listdir(input_dir)
+                  if name.rsplit('.', 1)[-1].lower() in INPUT_EXTENSIONS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the ZSM multi-factor model over a directory of FactSet exports.')
+    parser.add_argument('input_dir')
+    parser.add_argument('-o', '--output-dir', help='defaults to <input_dir>/processed')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('--final-only', action='store_true', help='write only the final score columns')
+    parser.add_argument('--nan-policy', choices=['propagate', 'omit'],
+                        help="defaults to 'omit' with --source raw (raw inputs have gaps in most "
+                             "factors) and 'propagate' otherwise, as in ZSM.py")
+    parser.add_argument('--group-by', choices=['FactSet Econ Sector', 'FactSet Ind'],
+                        help='z-score factors within each sector or industry')
+    parser.add_argument('--method', choices=METHODS, default='zscore',
+                        help='zscore (mean/std), robust (median/IQR) or winsorized z-score')
+    parser.add_argument('--source', choices=['scores', 'raw'], default='scores',
+                        help='standardize the upstream IQR/W scores or the raw factor values')
+    args = parser.parse_args(argv)
+    if args.nan_policy is None:
+        args.nan_policy = 'omit' if args.source == 'raw' else 'propagate'
+
+    paths = find_exports(args.input_dir)
+    if not paths:
+        print(f"No exports found in {args.input_dir}")
+        return 1
+    output_dir = args.output_dir or os.path.join(args.input_dir, 'processed')
+    os.makedirs(output_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    results, failures = [], []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        options = dict(nan_policy=args.nan_policy, group_by=args.group_by, method=args.method, source=args.source)
+        futures = {pool.submit(process_file, path, output_dir, args.final_only, **options): path
+                   for path in paths}
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                failures.append(futures[future])
+                print(f"Error processing {futures[future]}: {e}", file=sys.stderr)
+    elapsed = time.perf_counter() - started
+
+    # Per-file timing summary
+    name_width = max(len(os.path.basename(r['input'])) for r in results) if results else 4
+    print(f"{'file':<{name_width}}  {'rows':>7}  {'read':>7}  {'score':>7}  {'write':>7}  {'total':>7}")
+    for result in sorted(results, key=lambda r: r['input']):
+        t = result['timings']
+        print(f"{os.path.basename(result['input']):<{name_width}}  {result['rows']:>7}  "
+              f"{t['read']:>7.2f}  {t['score']:>7.2f}  {t['write']:>7.2f}  {t['total']:>7.2f}")
+    busy = sum(r['timings']['total'] for r in results)
+    print(f"{len(results)} files in {elapsed:.2f}s wall ({busy:.2f}s of work across {args.workers} workers), "
+          f"{len(failures)} failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())